@@ -0,0 +1,304 @@
+# Animated previews of mechanisms.
+#
+# A mechanism is a list of parts. Each part is one outline in its own frame, with
+# the pivot at the origin, plus the angle it is turned through and the position of
+# its pivot in every frame. Nothing is regenerated per frame:
+#
+#  - export_animated_svg writes each outline once as a compact path and moves it with
+#    SMIL transforms, so the file is as small as a still and plays in any browser.
+#  - render_frames rasterizes each outline once into a coverage map, and every frame
+#    only samples those maps through the part transforms. Samples for angles the part
+#    has already been drawn at (gears repeat every tooth) are reused.
+#
+# PNG files are written with zlib, so neither PIL nor matplotlib is needed.
+
+import collections
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from .export import svg_path
+from .tooth import make_gear
+
+
+Part = collections.namedtuple('Part', 'outline angles offsets symmetry')
+
+COLORS = [(0.20, 0.40, 0.70), (0.85, 0.45, 0.15), (0.30, 0.60, 0.30),
+          (0.70, 0.25, 0.30), (0.50, 0.40, 0.65), (0.55, 0.55, 0.55)]
+
+
+def spin(outline, frames, turns=1.0, center=(0.0, 0.0), phase=0.0, symmetry=1):
+    """
+    returns a part turning at constant speed about a fixed center through turns full
+    turns over frames frames. symmetry is the number of positions per turn at which
+    the outline looks the same (the teeth of a gear).
+    """
+    angles = phase + 2.0 * math.pi * turns * np.arange(frames) / frames
+    offsets = np.tile(np.asarray(center, dtype=float), (frames, 1))
+    return Part(np.asarray(outline, dtype=float), angles, offsets, symmetry)
+
+
+def gear_train(diameter, pressure_angle, teeth, pitch, frames, turns=1.0, **kwargs):
+    """
+    lays out a row of meshing tooth.make_gear gears along +x, the first centered on the
+    origin and turning turns times over frames frames. returns a list of parts.
+    kwargs go to make_gear.
+    """
+    parts = []
+    x = 0.0
+    phase = 0.0
+    for i, z in enumerate(teeth):
+        if i:
+            prev = teeth[i-1]
+            x += (prev + z) / 2.0 * diameter / float(pitch)
+            # a space faces the tooth of the previous gear on the line of centers
+            offset = (-phase * prev / (2.0 * math.pi)) % 1.0
+            phase = math.pi + 2.0 * math.pi * (offset - 0.5) / z
+            turns = -turns * prev / float(z)
+        outline = make_gear(diameter, pressure_angle, z, pitch, **kwargs)
+        parts.append(spin(outline, frames, turns, (x, 0.0), phase, z))
+    return parts
+
+
+def _bounds(parts, margin=1.1):
+    """returns (x, y, width, height) holding every part in every frame, grown by margin"""
+    lo = []
+    hi = []
+    for part in parts:
+        r = np.hypot(part.outline[:, 0], part.outline[:, 1]).max()
+        lo.append(part.offsets.min(axis=0) - r)
+        hi.append(part.offsets.max(axis=0) + r)
+    lo = np.min(lo, axis=0)
+    hi = np.max(hi, axis=0)
+    center = (lo + hi) / 2.0
+    half = (hi - lo) / 2.0 * margin
+    return center[0] - half[0], center[1] - half[1], 2.0 * half[0], 2.0 * half[1]
+
+
+def _uniform(values):
+    """true if values change by the same step every frame"""
+    if len(values) < 2:
+        return True
+    step = np.diff(values, axis=0)
+    return np.allclose(step, step[0], rtol=0.0, atol=1e-9)
+
+
+def _closing(values, period=None):
+    """
+    the value after the last frame that loops back to the first, continuing the last
+    step; for angles (period 2 pi) a whole number of turns may be added
+    """
+    if period is None:
+        return values[0]
+    ahead = 2.0 * values[-1] - values[-2] if len(values) > 1 else values[0]
+    return values[0] + period * round((ahead - values[0]) / period)
+
+
+def _values(rows):
+    """SMIL values list"""
+    return ';'.join(' '.join('%g' % v for v in np.atleast_1d(row)) for row in rows)
+
+
+def export_animated_svg(parts, filename, duration=10.0, scale=1.0, colors=None, precision=3):
+    """
+    writes parts as one looping SMIL-animated svg lasting duration seconds. each outline
+    is written once; constant motions animate from one end to the other, any other
+    motion through its value in every frame. outlines are written as svg_path with
+    precision decimals.
+    """
+    colors = colors or COLORS
+    x, y, width, height = (scale * v for v in _bounds(parts))
+
+    out = open(filename, 'w')
+    out.write('<?xml version="1.0" standalone="no" ?>\n')
+    out.write('<svg xmlns="http://www.w3.org/2000/svg" version="1.1" viewBox="%f %f %f %f" '
+              'width="%fpx" height="%fpx">\n' % (x, y, width, height, width, height))
+
+    for i, part in enumerate(parts):
+        color = '#%02x%02x%02x' % tuple(int(255 * c) for c in colors[i % len(colors)])
+        frames = len(part.angles)
+        offsets = scale * part.offsets
+        angles = np.degrees(np.unwrap(part.angles))
+
+        out.write('<g transform="translate(%g %g)">\n' % tuple(offsets[0]))
+        if not np.allclose(offsets, offsets[0]):
+            rows = np.vstack([offsets, offsets[:1]])
+            out.write('<animateTransform attributeName="transform" type="translate" dur="%gs" '
+                      'repeatCount="indefinite" values="%s" />\n' % (duration, _values(rows)))
+
+        out.write('<g transform="rotate(%g)">\n' % angles[0])
+        if _uniform(angles) and frames > 1:
+            end = angles[0] + (angles[1] - angles[0]) * frames
+            out.write('<animateTransform attributeName="transform" type="rotate" dur="%gs" '
+                      'repeatCount="indefinite" from="%g" to="%g" />\n' % (duration, angles[0], end))
+        elif not np.allclose(angles, angles[0]):
+            rows = np.append(angles, _closing(angles, 360.0))
+            out.write('<animateTransform attributeName="transform" type="rotate" dur="%gs" '
+                      'repeatCount="indefinite" values="%s" />\n' % (duration, _values(rows)))
+
+        out.write('<path style="fill:%s;fill-opacity:0.6;stroke:black;stroke-width:%g" d="'
+                  % (color, 0.002 * max(width, height)))
+        out.write(svg_path(part.outline[:, 0], part.outline[:, 1], scale, precision=precision))
+        out.write('" />\n</g>\n</g>\n')
+
+    out.write('</svg>\n')
+    out.close()
+
+
+def rasterize(outline, pixel, supersample=4):
+    """
+    returns the coverage of a closed outline (even-odd fill) as a float32 array with
+    square pixels of size pixel, centered on the origin, and the half-width it spans
+    """
+    outline = np.asarray(outline, dtype=float)
+    half = math.ceil(np.hypot(outline[:, 0], outline[:, 1]).max() / pixel) + 1
+    n = 2 * half * supersample
+    step = pixel / supersample
+    lo = -half * pixel
+
+    # rows whose centers each edge crosses, half-open so shared vertices count once
+    x0, y0 = outline[:-1, 0], outline[:-1, 1]
+    x1, y1 = outline[1:, 0], outline[1:, 1]
+    first = np.ceil((np.minimum(y0, y1) - lo) / step - 0.5).astype(np.intp)
+    last = np.ceil((np.maximum(y0, y1) - lo) / step - 0.5).astype(np.intp)
+    counts = np.maximum(last - first, 0)
+    edge = np.repeat(np.arange(len(x0)), counts)
+    row = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    yc = lo + (row + 0.5) * step
+    t = (yc - y0[edge]) / (y1[edge] - y0[edge])
+    xc = x0[edge] + t * (x1[edge] - x0[edge])
+    col = np.clip(np.ceil((xc - lo) / step - 0.5).astype(np.intp), 0, n)
+
+    # every crossing toggles inside/outside from its column on
+    toggles = np.bincount(row * (n + 1) + col, minlength=n * (n + 1)).reshape(n, n + 1)
+    inside = (np.cumsum(toggles, axis=1)[:, :n] & 1).astype(np.float32)
+
+    m = 2 * half
+    coverage = inside.reshape(m, supersample, m, supersample).mean(axis=(1, 3))
+    return coverage, half * pixel
+
+
+def _sample(coverage, extent, x, y):
+    """bilinear lookup of a coverage map at local coordinates, 0 outside it"""
+    n = coverage.shape[0]
+    u = (x + extent) * (n / (2.0 * extent)) - 0.5
+    v = (y + extent) * (n / (2.0 * extent)) - 0.5
+    i = np.floor(u).astype(np.intp)
+    j = np.floor(v).astype(np.intp)
+    fu = (u - i).astype(np.float32)
+    fv = (v - j).astype(np.float32)
+
+    padded = np.pad(coverage, 1)
+    i = np.clip(i + 1, 0, n)
+    j = np.clip(j + 1, 0, n)
+    top = padded[j, i] * (1 - fu) + padded[j, i + 1] * fu
+    bottom = padded[j + 1, i] * (1 - fu) + padded[j + 1, i + 1] * fu
+    return top * (1 - fv) + bottom * fv
+
+
+class Renderer(object):
+    """
+    draws frames of a list of parts into RGB arrays.
+
+    the coverage map of every outline is rasterized once. the patch a part leaves at
+    a given angle, taken modulo its symmetry and rounded to a small fraction of a pixel
+    at its rim, is kept as well, so a turning gear is only sampled for its first tooth.
+    """
+
+    cache = 512
+
+    def __init__(self, parts, width=480, colors=None, supersample=4):
+        self.parts = parts
+        self.colors = np.array(colors or COLORS, dtype=np.float32)
+        self.x, self.y, w, h = _bounds(parts)
+        self.pixel = w / float(width)
+        self.shape = (int(math.ceil(h / self.pixel)), int(width))
+
+        self.maps = [rasterize(part.outline, self.pixel, supersample) for part in parts]
+        self.patches = [{} for _ in parts]
+
+    def patch(self, k, angle, dx, dy):
+        """
+        coverage of part k turned by angle, on a square of pixels around its pivot
+        offset by (dx, dy) pixels from the pixel grid
+        """
+        part = self.parts[k]
+        coverage, extent = self.maps[k]
+        period = 2.0 * math.pi / part.symmetry
+        quantum = self.pixel / extent / 8.0
+        key = (int(round((angle % period) / quantum)), round(dx, 2), round(dy, 2))
+        cached = self.patches[k].get(key)
+        if cached is not None:
+            return cached
+
+        if len(self.patches[k]) >= self.cache:
+            self.patches[k].clear()
+        angle = key[0] * quantum
+        half = coverage.shape[0] // 2 + 1
+        grid = (np.arange(-half, half + 1) + 0.5) * self.pixel
+        px = grid[None, :] - dx * self.pixel
+        py = grid[:, None] - dy * self.pixel
+        c, s = math.cos(angle), math.sin(angle)
+        patch = _sample(coverage, extent, c * px + s * py, c * py - s * px)
+        self.patches[k][key] = patch
+        return patch
+
+    def frame(self, index):
+        """returns frame index as an (h, w, 3) uint8 array"""
+        height, width = self.shape
+        image = np.ones((height, width, 3), dtype=np.float32)
+        for k, part in enumerate(self.parts):
+            # pivot position in pixels, split into a whole pixel and a remainder
+            u = (part.offsets[index, 0] - self.x) / self.pixel
+            v = (part.offsets[index, 1] - self.y) / self.pixel
+            iu, iv = int(math.floor(u)), int(math.floor(v))
+            patch = self.patch(k, part.angles[index], u - iu, v - iv)
+
+            half = patch.shape[0] // 2
+            top, left = iv - half, iu - half
+            r0, c0 = max(top, 0), max(left, 0)
+            r1, c1 = min(top + patch.shape[0], height), min(left + patch.shape[1], width)
+            if r0 >= r1 or c0 >= c1:
+                continue
+            alpha = patch[r0 - top:r1 - top, c0 - left:c1 - left, None]
+            color = self.colors[k % len(self.colors)]
+            region = image[r0:r1, c0:c1]
+            region += alpha * (color - region)
+
+        return (image * 255.0 + 0.5).astype(np.uint8)
+
+
+def write_png(filename, image, level=3):
+    """writes an (h, w, 3) uint8 array as an 8-bit RGB png"""
+    height, width = image.shape[:2]
+    rows = np.empty((height, 1 + 3 * width), dtype=np.uint8)
+    rows[:, 0] = 0
+    rows[:, 1:] = image.reshape(height, -1)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    out = open(filename, 'wb')
+    out.write(b'\x89PNG\r\n\x1a\n')
+    out.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+    out.write(chunk(b'IDAT', zlib.compress(rows.tobytes(), level)))
+    out.write(chunk(b'IEND', b''))
+    out.close()
+
+
+def render_frames(parts, pattern='frame%04d.png', width=480, colors=None, supersample=4):
+    """
+    writes every frame of parts as a png named by pattern % frame and returns the
+    file names
+    """
+    renderer = Renderer(parts, width, colors, supersample)
+    names = []
+    for index in range(len(parts[0].angles)):
+        name = pattern % index
+        write_png(name, renderer.frame(index))
+        names.append(name)
+    return names
@@ -0,0 +1,326 @@
+# Batch generation of parts from spec files, without Rhino.
+#
+#     python -m gears specs.csv -o out -j 4 --format svg,dxf
+#
+# A spec file lists one part per row (CSV with a header line), per line (JSONL) or
+# per element of a JSON list. Every row names a generator (kind) and its arguments:
+#
+#     name,kind,diameter,pressure_angle,teeth,pitch
+#     pinion,gear,1,20,12,8
+#     wheel,tooth,1,20,40,8
+#
+# Startup is kept short for use from scripts and makefiles: only the standard library
+# is imported up front, numpy and the generators are imported by the rows that need
+# them, and a process pool is only started for jobs big enough to pay for it.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+
+def _integer(value):
+    """integer column: a whole JSON number or a string int() takes"""
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return int(value)
+
+
+# argument name -> type, for the values read from CSV or JSON
+FIELDS = {
+    'name': str,
+    'kind': str,
+    'format': str,
+    'diameter': float,
+    'pressure_angle': float,
+    'teeth': _integer,
+    'pitch': float,
+    'backlash': float,
+    'steps': _integer,
+    'root_steps': _integer,
+    'mate_teeth': _integer,
+    'scale': float,
+    'precision': _integer,
+    'resolution': float,
+    'thickness': float,
+    'feed': float,
+}
+
+DEFAULTS = {
+    'kind': 'gear',
+    'diameter': 1.0,
+    'pressure_angle': 20.0,
+    'pitch': 8.0,
+    'backlash': 0.05,
+    'steps': 30,
+    'scale': 1.0,
+    'thickness': 1.0,
+    'feed': 100.0,
+}
+
+# parallel workers only pay for their startup from this many rows on
+PARALLEL_ROWS = 8
+
+
+def _gx_gear(spec):
+    from .gx import make_gear
+    points = list(make_gear(spec['diameter'], spec['pressure_angle'], spec['teeth'],
+                            spec['pitch'], spec['backlash'], spec['steps']))
+    return [p[0] for p in points], [p[1] for p in points]
+
+
+def _tooth_gear(spec):
+    from .tooth import make_gear
+    return _columns(make_gear(spec['diameter'], spec['pressure_angle'], spec['teeth'],
+                              spec['pitch'], spec.get('shift', 0.0), spec['backlash'],
+                              spec['steps'], spec.get('root_steps', 30)))
+
+
+def _internal_gear(spec):
+    from .tooth import make_internal_gear
+    return _columns(make_internal_gear(spec['diameter'], spec['pressure_angle'], spec['teeth'],
+                                       spec['pitch'], spec['backlash'], spec['steps']))
+
+
+def _cycloidal_gear(spec):
+    from .cycloid import make_cycloidal_gear
+    return _columns(make_cycloidal_gear(spec['diameter'], spec['teeth'], spec['pitch'],
+                                        spec.get('mate_teeth'), spec['backlash'], spec['steps']))
+
+
+def _columns(points):
+    """x and y lists of an (n, 2) array"""
+    return points[:, 0].tolist(), points[:, 1].tolist()
+
+
+KINDS = {
+    'gear': _gx_gear,
+    'tooth': _tooth_gear,
+    'internal': _internal_gear,
+    'cycloidal': _cycloidal_gear,
+}
+
+# the columns every kind reads; name, kind and the export options go with any kind
+COLUMNS = {
+    'gear': ('diameter', 'pressure_angle', 'teeth', 'pitch', 'backlash', 'steps'),
+    'tooth': ('diameter', 'pressure_angle', 'teeth', 'pitch', 'shift', 'backlash', 'steps', 'root_steps'),
+    'internal': ('diameter', 'pressure_angle', 'teeth', 'pitch', 'backlash', 'steps'),
+    'cycloidal': ('diameter', 'teeth', 'pitch', 'mate_teeth', 'backlash', 'steps'),
+}
+
+COMMON_COLUMNS = ('name', 'kind', 'format', 'scale', 'precision', 'resolution', 'thickness', 'feed')
+
+
+def _export_svg(px, py, path, spec):
+    from .export import export_svg
+    export_svg(px, py, path, spec['scale'], spec.get('precision'), spec.get('resolution'))
+
+
+def _export_dxf(px, py, path, spec):
+    from .export import export_dxf
+    export_dxf(px, py, path, spec['scale'])
+
+
+def _export_gcode(px, py, path, spec):
+    from .export import export_gcode
+    export_gcode(px, py, path, spec['scale'], spec['feed'])
+
+
+def _export_stl(px, py, path, spec):
+    from .stl import export_stl
+    export_stl(px, py, path, spec['scale'], spec['thickness'])
+
+
+FORMATS = {
+    'svg': _export_svg,
+    'dxf': _export_dxf,
+    'gcode': _export_gcode,
+    'stl': _export_stl,
+}
+
+EXTENSIONS = {'gcode': 'nc'}
+
+
+def _shift(value):
+    """profile shift column: a number or 'auto'"""
+    return value if value == 'auto' else float(value)
+
+
+def parse_spec(row, line=None, number=None):
+    """
+    converts one spec row (a dict of strings or JSON values) into generator arguments,
+    filling in DEFAULTS. raises ValueError for unknown kinds, columns or values, and for
+    columns the kind does not read. a row without a name is called kind_number, number
+    defaulting to the line.
+    """
+    spec = dict(DEFAULTS)
+    where = '' if line is None else 'row %d: ' % line
+    given = []
+    for key, value in row.items():
+        if key is None or value is None or value == '':
+            continue
+        key = key.strip()
+        if key == 'shift':
+            convert = _shift
+        elif key in FIELDS:
+            convert = FIELDS[key]
+        else:
+            raise ValueError("%sunknown column %r" % (where, key))
+        given.append(key)
+        try:
+            spec[key] = convert(value.strip() if isinstance(value, str) else value)
+        except (TypeError, ValueError):
+            raise ValueError("%sbad value %r for %s" % (where, value, key))
+
+    if spec['kind'] not in KINDS:
+        raise ValueError("%sunknown kind %r, expected one of %s"
+                         % (where, spec['kind'], ', '.join(sorted(KINDS))))
+    unused = [key for key in given if key not in COLUMNS[spec['kind']] and key not in COMMON_COLUMNS]
+    if unused:
+        raise ValueError("%skind %s does not take %s" % (where, spec['kind'], ', '.join(unused)))
+    if 'teeth' not in spec:
+        raise ValueError("%steeth missing" % where)
+    if 'name' not in spec:
+        if number is None:
+            number = spec['teeth'] if line is None else line
+        spec['name'] = '%s_%d' % (spec['kind'], number)
+    return spec
+
+
+def read_specs(path, first=1):
+    """
+    reads a CSV, JSON or JSONL spec file (by extension; '-' reads JSONL from stdin) and
+    returns the parsed specs. rows are numbered from first on for the names of unnamed
+    ones, so that the rows of several files can be numbered in sequence
+    """
+    if path == '-':
+        rows = [json.loads(line) for line in sys.stdin if line.strip()]
+    else:
+        ext = os.path.splitext(path)[1].lower()
+        with open(path) as f:
+            if ext == '.csv':
+                rows = list(csv.DictReader(f))
+            elif ext == '.json':
+                rows = json.load(f)
+                if isinstance(rows, dict):
+                    rows = rows['parts']
+            elif ext in ('.jsonl', '.ndjson'):
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                raise ValueError("%s: expected a .csv, .json or .jsonl file" % path)
+    try:
+        return [parse_spec(row, i + 1, first + i) for i, row in enumerate(rows)]
+    except ValueError as e:
+        raise ValueError('%s: %s' % (path, e))
+
+
+def run_spec(spec, directory='.', formats=('svg',)):
+    """generates one part and writes it in every format, returns the paths written"""
+    px, py = KINDS[spec['kind']](spec)
+    if spec.get('format'):
+        formats = spec['format'].split(',')
+
+    paths = []
+    for fmt in formats:
+        fmt = fmt.strip()
+        if fmt not in FORMATS:
+            raise ValueError("unknown format %r, expected one of %s" % (fmt, ', '.join(sorted(FORMATS))))
+        path = os.path.join(directory, '%s.%s' % (spec['name'], EXTENSIONS.get(fmt, fmt)))
+        FORMATS[fmt](px, py, path, spec)
+        paths.append(path)
+    return paths
+
+
+def _run(args):
+    """pool entry point: returns (paths, error message)"""
+    try:
+        return run_spec(*args), None
+    except Exception as e:
+        return [], '%s: %s' % (type(e).__name__, e)
+
+
+def run_specs(specs, directory='.', formats=('svg',), jobs=None, progress=None):
+    """
+    generates and exports specs, in parallel from PARALLEL_ROWS rows on unless jobs is
+    1. progress(done, total, spec, paths, error) is called as each part finishes.
+    returns the number of parts that failed.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    work = [(spec, directory, formats) for spec in specs]
+    failed = 0
+    if jobs == 1 or len(work) < PARALLEL_ROWS:
+        results = (_run(w) for w in work)
+        pool = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(jobs)
+        results = pool.map(_run, work, chunksize=max(1, len(work) // (8 * (jobs or os.cpu_count() or 1))))
+
+    try:
+        for done, (spec, (paths, error)) in enumerate(zip(specs, results), 1):
+            failed += error is not None
+            if progress:
+                progress(done, len(work), spec, paths, error)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return failed
+
+
+def _reporter(verbose):
+    """progress callback printing to stderr"""
+    start = time.time()
+
+    def report(done, total, spec, paths, error):
+        if error:
+            sys.stderr.write('[%d/%d] %s failed: %s\n' % (done, total, spec['name'], error))
+        elif verbose:
+            sys.stderr.write('[%d/%d] %s\n' % (done, total, ' '.join(paths)))
+        if done == total and verbose:
+            sys.stderr.write('%d parts in %.2fs\n' % (total, time.time() - start))
+
+    return report
+
+
+def _rhino(specs):
+    """adds every part to the open Rhino document as a polyline"""
+    import rhinoscriptsyntax as rs
+    for spec in specs:
+        px, py = KINDS[spec['kind']](spec)
+        rs.AddPolyline([(x, y, 0) for x, y in zip(px, py)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gears',
+                                     description='generate and export parts listed in spec files')
+    parser.add_argument('specs', nargs='+', help=".csv, .json or .jsonl spec files, '-' for JSONL on stdin")
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    parser.add_argument('-f', '--format', default='svg',
+                        help='comma separated formats for rows without one (%s)' % ', '.join(sorted(FORMATS)))
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only report failures')
+    parser.add_argument('--rhino', action='store_true', help='add the parts to the Rhino document instead')
+    args = parser.parse_args(argv)
+
+    specs = []
+    try:
+        for path in args.specs:
+            specs.extend(read_specs(path, len(specs) + 1))
+    except (IOError, OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.rhino:
+        _rhino(specs)
+        return 0
+
+    formats = [f.strip() for f in args.format.split(',')]
+    failed = run_specs(specs, args.output, formats, args.jobs, _reporter(not args.quiet))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
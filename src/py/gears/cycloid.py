@@ -0,0 +1,269 @@
+# Cycloidal gear teeth and cycloidal drive discs over arrays.
+#
+# A clock-style cycloidal tooth has an epicycloid above the pitch circle and a
+# hypocycloid below it, each traced by a generating circle rolling on the pitch
+# circle. The usual choice rolls a circle of half the mating gear's pitch radius
+# for the addendum and half the gear's own for the dedendum, which makes the
+# dedendum flanks straight radial lines. Two gears mesh when each one's addendum
+# circle is the other's dedendum circle.
+#
+# A cycloidal drive disc has lobes+1 housing pins around it; its outline is the
+# curtate epicycloid traced by a point eccentricity off the disc center, offset
+# inward by the pin radius.
+#
+# Teeth are built in polar form for unit pitch, cached like tooth.py, and turned into
+# closed outlines by tooth.replicate, so the cost is the same as the involute path.
+#
+# https://www.csparks.com/watchmaking/CycloidalGears/index.jxl
+
+import math
+
+import numpy as np
+
+from .gx import gears_circular_tooth_thickness
+from .tooth import mirror_polar, replicate
+
+
+ADDENDUM = 1.0
+DEDENDUM = 1.25
+
+_teeth = {}
+
+
+def epicycloid(pitch_radius, rolling_radius, t):
+    """
+    returns (radius, angle) of the epicycloid traced by a circle of rolling_radius
+    rolling outside pitch_radius, starting on it at angle 0, after the circle center
+    has turned through t
+    """
+    R = pitch_radius + rolling_radius
+    k = R / rolling_radius
+    x = R * np.cos(t) - rolling_radius * np.cos(k * t)
+    y = R * np.sin(t) - rolling_radius * np.sin(k * t)
+    return np.hypot(x, y), np.arctan2(y, x)
+
+
+def hypocycloid(pitch_radius, rolling_radius, t):
+    """
+    returns (radius, angle) of the hypocycloid traced by a circle of rolling_radius
+    rolling inside pitch_radius, starting on it at angle 0, after the circle center
+    has turned through t
+    """
+    R = pitch_radius - rolling_radius
+    k = R / rolling_radius
+    x = R * np.cos(t) + rolling_radius * np.cos(k * t)
+    y = R * np.sin(t) - rolling_radius * np.sin(k * t)
+    return np.hypot(x, y), np.arctan2(y, x)
+
+
+def _roll_to_radius(pitch_radius, rolling_radius, radius, sign):
+    """
+    center angle t at which an epicycloid (sign 1) or hypocycloid (sign -1) first
+    reaches a given radius
+    """
+    R = pitch_radius + sign * rolling_radius
+    c = sign * (R * R + rolling_radius**2 - radius * radius) / (2.0 * R * rolling_radius)
+    return rolling_radius / pitch_radius * math.acos(max(-1.0, min(1.0, c)))
+
+
+def cycloidal_tooth_polar(teeth, mate_teeth=None, backlash=0.05, steps=30,
+                          addendum=ADDENDUM, dedendum=DEDENDUM, flank_radius=None):
+    """
+    returns (radius, angle) arrays of one unit-pitch cycloidal tooth centered on the
+    +x axis, running from the root of the lower flank over the tip to the root of the
+    upper flank.
+
+    the addendum rolls a circle of a quarter of mate_teeth (half the mating pitch
+    radius, the mate defaults to an equal gear), the dedendum one of flank_radius,
+    which defaults to half of this gear's pitch radius. tips that would come to a
+    point below the addendum circle are left pointed.
+    """
+    mate_teeth = teeth if mate_teeth is None else mate_teeth
+    key = (int(teeth), int(mate_teeth), float(backlash), steps, float(addendum),
+           float(dedendum), flank_radius)
+    if key in _teeth:
+        return _teeth[key]
+
+    rp = teeth / 2.0
+    ra = rp + addendum
+    rf = rp - dedendum
+    rolling = mate_teeth / 4.0
+    flank = rp / 2.0 if flank_radius is None else float(flank_radius)
+    if not 0.0 < flank < rp:
+        raise ValueError("flank_radius must lie between 0 and the pitch radius")
+
+    half = gears_circular_tooth_thickness(1.0, backlash) / (2.0 * rp)
+
+    # lower flank addendum: leans toward the tooth center as it rises
+    t = np.linspace(0.0, _roll_to_radius(rp, rolling, ra, 1), steps + 1)
+    ar, atheta = epicycloid(rp, rolling, t)
+    atheta = atheta - half
+    tip = np.nonzero(atheta >= 0.0)[0]
+    if len(tip):
+        # pointed: stop where the flank reaches the center line
+        i = tip[0]
+        u = -atheta[i-1] / (atheta[i] - atheta[i-1])
+        ar = np.append(ar[:i], ar[i-1] + u * (ar[i] - ar[i-1]))
+        atheta = np.append(atheta[:i], 0.0)
+
+    # lower flank dedendum: leans away from the tooth center as it falls
+    t = np.linspace(_roll_to_radius(rp, flank, rf, -1), 0.0, steps + 1)
+    dr, dtheta = hypocycloid(rp, flank, t)
+    dtheta = -dtheta - half
+
+    r = np.concatenate([dr, ar[1:]])
+    theta = np.concatenate([dtheta, atheta[1:]])
+    if len(tip):
+        r, theta = r[:-1], theta[:-1]
+        r, theta = mirror_polar(r, theta)
+        r = np.insert(r, len(r) // 2, ar[-1])
+        theta = np.insert(theta, len(theta) // 2, 0.0)
+    else:
+        r, theta = mirror_polar(r, theta)
+    for a in (r, theta):
+        a.setflags(write=False)
+
+    _teeth[key] = (r, theta)
+    return r, theta
+
+
+def make_cycloidal_tooth(teeth, pitch, mate_teeth=None, backlash=0.05, steps=30):
+    """generates a single cycloidal tooth profile as x and y arrays"""
+    r, theta = cycloidal_tooth_polar(teeth, mate_teeth, backlash, steps)
+    return r * np.cos(theta) / pitch, r * np.sin(theta) / pitch
+
+
+def make_cycloidal_gear(diameter, teeth, pitch, mate_teeth=None, backlash=0.05, steps=30,
+                        phase=0.0):
+    """
+    generates a clock-style cycloidal gear as an (n, 2) array of closed outline points,
+    scaled by diameter like gx.make_gear. phase may be an array of k starting angles,
+    giving (k, n, 2).
+    """
+    r, theta = cycloidal_tooth_polar(teeth, mate_teeth, backlash, steps)
+    return replicate(r, theta, teeth, diameter / float(pitch), phase)
+
+
+def make_cycloidal_pair(diameter, wheel, pinion, pitch, backlash=0.05, steps=30):
+    """
+    generates a meshing wheel and pinion, each rolling half the other's pitch radius for
+    its addendum. returns (wheel, pinion, center_distance); the wheel is centered on the
+    origin and the pinion on +x, turned so that a space faces the wheel tooth on +x.
+    """
+    scale = diameter / float(pitch)
+    distance = (wheel + pinion) / 2.0 * scale
+    a = make_cycloidal_gear(diameter, wheel, pitch, pinion, backlash, steps)
+    b = make_cycloidal_gear(diameter, pinion, pitch, wheel, backlash, steps,
+                            math.pi + math.pi / pinion)
+    return a, b + (distance, 0.0), distance
+
+
+def cycloidal_disc_check(lobes, pin_circle_radius, pin_radius, eccentricity):
+    """raises ValueError unless the disc outline is a simple curve and the pins fit"""
+    pins = lobes + 1
+    if lobes < 2:
+        raise ValueError("a cycloidal disc needs at least 2 lobes")
+    if not 0.0 < eccentricity * pins < pin_circle_radius:
+        raise ValueError("eccentricity must be positive and below pin_circle_radius / (lobes + 1)")
+    if pin_radius >= pin_circle_radius * math.sin(math.pi / pins):
+        raise ValueError("pins of radius %g overlap on a circle of radius %g"
+                         % (pin_radius, pin_circle_radius))
+
+    # the disc outline is the pin-center curve offset inward by the pin radius, which
+    # folds into cusps wherever that curve bends outward tighter than the pin
+    R, e = pin_circle_radius, eccentricity
+    t = np.linspace(0.0, 2.0 * math.pi, 64 * lobes, endpoint=False)
+    dx = -R * np.sin(t) + e * pins * np.sin(pins * t)
+    dy = -R * np.cos(t) + e * pins * np.cos(pins * t)
+    ddx = -R * np.cos(t) + e * pins * pins * np.cos(pins * t)
+    ddy = R * np.sin(t) - e * pins * pins * np.sin(pins * t)
+    # the curve runs clockwise, so it bends outward where the curvature is negative
+    curvature = (dx * ddy - dy * ddx) / np.hypot(dx, dy)**3
+    if curvature.min() < 0.0 and pin_radius >= -1.0 / curvature.min():
+        raise ValueError("pin radius %g cuts the disc lobes into cusps" % pin_radius)
+
+
+def cycloidal_disc(lobes, pin_circle_radius, pin_radius, eccentricity, steps=30):
+    """
+    returns the outline of a cycloidal drive disc centered on the origin as an (n, 2)
+    closed array, with steps points per lobe. the pins sit on pin_circle_radius around
+    a center eccentricity off the disc center, at (eccentricity, 0) with the crank at
+    angle 0.
+    """
+    cycloidal_disc_check(lobes, pin_circle_radius, pin_radius, eccentricity)
+    key = ('disc', lobes, float(pin_circle_radius), float(pin_radius), float(eccentricity), steps)
+    if key in _teeth:
+        return _teeth[key]
+
+    R, rr, e, n = pin_circle_radius, pin_radius, eccentricity, lobes + 1
+    t = np.linspace(0.0, 2.0 * math.pi, lobes * steps, endpoint=False)
+
+    # angle of the contact normal between disc and pin
+    psi = np.arctan2(np.sin((1 - n) * t), R / (e * n) - np.cos((1 - n) * t))
+    x = R * np.cos(t) - rr * np.cos(t + psi) - e * np.cos(n * t)
+    y = -R * np.sin(t) + rr * np.sin(t + psi) + e * np.sin(n * t)
+
+    outline = np.stack([x + e, y], axis=-1)
+    outline = np.concatenate([outline, outline[:1]])
+    outline.setflags(write=False)
+    _teeth[key] = outline
+    return outline
+
+
+def _circles(centers, radius, steps):
+    """(k, steps+1, 2) closed outlines of circles of one radius around k centers"""
+    a = np.linspace(0.0, 2.0 * math.pi, steps + 1)
+    ring = radius * np.stack([np.cos(a), np.sin(a)], axis=-1)
+    return np.asarray(centers, dtype=float)[:, None, :] + ring
+
+
+def make_cycloidal_drive(lobes, pin_circle_radius, pin_radius, eccentricity, angle=0.0,
+                         output_pins=0, output_circle_radius=None, output_pin_radius=None,
+                         steps=30):
+    """
+    lays out a single-disc cycloidal drive with the crank at angle (radians) around the
+    housing center at the origin. the disc turns by -angle/lobes, so the drive reduces
+    lobes:1 in reverse.
+
+    output_pins on output_circle_radius are optional; the disc gets a hole for each,
+    eccentricity larger in radius than the pin, offset with the disc. returns a dict:
+
+        'disc' (n, 2) outline, 'disc_center', 'pins' (lobes+1, m, 2) housing pin
+        outlines, 'pin_centers', 'holes' (output_pins, m, 2) and 'output_pins'
+        (output_pins, m, 2) outlines.
+    """
+    outline = cycloidal_disc(lobes, pin_circle_radius, pin_radius, eccentricity, steps)
+    pins = lobes + 1
+
+    # the disc center circles the housing center; the pins stay put
+    center = eccentricity * np.array([math.cos(angle), math.sin(angle)])
+    turn = -angle / lobes
+    c, s = math.cos(turn), math.sin(turn)
+    rotation = np.array([[c, s], [-s, c]])
+
+    # the outline was built around the crank at angle 0, with the housing at +e
+    local = outline - (eccentricity, 0.0)
+    disc = local.dot(rotation) + center
+
+    a = 2.0 * math.pi * np.arange(pins) / pins
+    pin_centers = pin_circle_radius * np.column_stack([np.cos(a), np.sin(a)])
+
+    layout = {
+        'disc': disc,
+        'disc_center': center,
+        'pins': _circles(pin_centers, pin_radius, steps),
+        'pin_centers': pin_centers,
+        'holes': np.zeros((0, steps + 1, 2)),
+        'output_pins': np.zeros((0, steps + 1, 2)),
+    }
+
+    if output_pins:
+        if output_circle_radius is None or output_pin_radius is None:
+            raise ValueError("output pins need output_circle_radius and output_pin_radius")
+        # output pins turn with the disc rotation about the housing center
+        a = 2.0 * math.pi * np.arange(output_pins) / output_pins + turn
+        out = output_circle_radius * np.column_stack([np.cos(a), np.sin(a)])
+        layout['output_pins'] = _circles(out, output_pin_radius, steps)
+        layout['holes'] = _circles(out + center, output_pin_radius + eccentricity, steps)
+
+    return layout
@@ -0,0 +1,636 @@
+# Streaming DXF reader.
+#
+# Reads the 2d outlines of existing parts back from DXF files, ASCII or binary, so
+# they can go through the same pipeline as generated ones. LINE, LWPOLYLINE, ARC
+# and CIRCLE entities of the ENTITIES section become (n, 2) point arrays, arcs and
+# polyline bulges being split into segments of at most max_angle. Pieces whose ends
+# meet, like the LINEs export.export_dxf writes, can be chained into profiles.
+#
+# ASCII files are read a block at a time and split into (group code, value) pairs.
+# The LINEs, which are most of a file like export.export_dxf writes, are then built
+# a group code at a time, with numpy converting the coordinates of a whole block at
+# once; only the other entities are built pair by pair. An entity cut off by the end
+# of a block is carried over to the next one, so only a block and the points kept
+# are held in memory, whatever the size of the file. Binary files are read as a
+# stream of pairs.
+#
+# DWG files (src/dwg) have to be saved as DXF first, e.g. with the ODA File Converter.
+#
+# http://help.autodesk.com/view/OARX/2018/ENU/?guid=GUID-235B22E0-A567-4CF6-92D3-38A2306D73F3
+
+import collections
+import heapq
+import io
+import math
+import struct
+
+import numpy as np
+
+
+Entity = collections.namedtuple('Entity', 'kind layer points closed')
+Profile = collections.namedtuple('Profile', 'points layer closed')
+
+BINARY_SENTINEL = b'AutoCAD Binary DXF\r\n\x1a\x00'
+
+# bytes of an ASCII file parsed at a time, entities of a binary one
+BLOCK_SIZE = 1 << 20
+BATCH_SIZE = 1 << 14
+
+# group code ranges by value type
+_FLOAT = [(10, 59), (110, 149), (210, 239), (460, 469), (1010, 1059)]
+_INT16 = [(60, 79), (170, 179), (270, 289), (370, 389), (400, 409), (1060, 1070)]
+_INT32 = [(90, 99), (420, 429), (440, 459), (1071, 1071)]
+_INT64 = [(160, 169)]
+_BOOL = [(290, 299)]
+_BINARY = [(310, 319), (1004, 1004)]
+
+
+def _types():
+    """value type of every group code below 1072, as a struct format ('s' for strings)"""
+    types = ['s'] * 1072
+    for fmt, ranges in (('d', _FLOAT), ('h', _INT16), ('i', _INT32), ('q', _INT64),
+                        ('B', _BOOL), ('b', _BINARY)):
+        for lo, hi in ranges:
+            types[lo:hi + 1] = [fmt] * (hi + 1 - lo)
+    return types
+
+
+_type = _types()
+
+
+class _CodeLines(dict):
+    """the group codes of the distinct ASCII code lines read, each parsed once"""
+
+    def __missing__(self, line):
+        code = self[line] = int(line)
+        return code
+
+
+_code_lines = _CodeLines()
+
+
+def _code(line):
+    """group code of an ASCII code line"""
+    return _code_lines[line]
+
+
+_structs = dict((fmt, struct.Struct('<' + fmt)) for fmt in 'dhiqBH')
+
+
+def _binary_tokens(f, block=1 << 16):
+    """
+    (code, value) pairs of a binary DXF (AutoCAD 2000 or later) past its sentinel, read
+    in blocks
+    """
+    code_struct = _structs['H']
+    buffer = b''
+    pos = 0
+    while True:
+        # room for a code and the largest fixed-size value
+        if len(buffer) - pos < 11:
+            buffer = buffer[pos:]
+            pos = 0
+            while len(buffer) < 11:
+                more = f.read(block)
+                if not more:
+                    break
+                buffer += more
+            if len(buffer) < 2:
+                return
+        code = code_struct.unpack_from(buffer, pos)[0]
+        pos += 2
+        fmt = _type[code] if code < 1072 else 's'
+        if fmt == 's':
+            end = buffer.find(b'\0', pos)
+            while end < 0:
+                more = f.read(block)
+                if not more:
+                    raise ValueError("binary DXF ends inside a string")
+                buffer = buffer[pos:] + more
+                pos = 0
+                end = buffer.find(b'\0')
+            value = buffer[pos:end].decode('utf-8', 'replace')
+            pos = end + 1
+        elif fmt == 'b':
+            n = buffer[pos]
+            pos += 1
+            while len(buffer) - pos < n:
+                more = f.read(block)
+                if not more:
+                    raise ValueError("binary DXF ends inside a value")
+                buffer = buffer[pos:] + more
+                pos = 0
+            value = buffer[pos:pos + n]
+            pos += n
+        else:
+            packed = _structs[fmt]
+            if len(buffer) - pos < packed.size:
+                raise ValueError("binary DXF ends inside a value")
+            value = packed.unpack_from(buffer, pos)[0]
+            pos += packed.size
+        yield code, value
+
+
+def _binary(f):
+    """true for a binary DXF, leaving the file past the sentinel, else at the start"""
+    if f.read(len(BINARY_SENTINEL)) == BINARY_SENTINEL:
+        return True
+    f.seek(0)
+    return False
+
+
+def _open(filename):
+    """
+    opens a DXF file and returns it with an iterator over its (group code, value)
+    pairs as read: code and value lines for ASCII files, typed values for binary ones
+    """
+    f = open(filename, 'rb')
+    if _binary(f):
+        return f, _binary_tokens(f)
+    lines = iter(io.TextIOWrapper(f, encoding='utf-8', errors='replace'))
+    return f, zip(lines, lines)
+
+
+def tokens(filename):
+    """yields the typed (group code, value) pairs of an ASCII or binary DXF file"""
+    f, pairs = _open(filename)
+    with f:
+        for code, value in pairs:
+            if isinstance(code, int):
+                yield code, value
+                continue
+            code = _code(code)
+            fmt = _type[code] if code < 1072 else 's'
+            if fmt == 'd':
+                yield code, float(value)
+            elif fmt in 'hiqB':
+                yield code, int(value)
+            else:
+                yield code, value.rstrip('\r\n')
+
+
+def arc_points(cx, cy, radius, start, sweep, max_angle=math.radians(5.0)):
+    """points of an arc from angle start through sweep (radians, positive anticlockwise)"""
+    steps = max(1, int(math.ceil(abs(sweep) / max_angle)))
+    a = start + sweep * np.linspace(0.0, 1.0, steps + 1)
+    return np.column_stack([cx + radius * np.cos(a), cy + radius * np.sin(a)])
+
+
+def _bulge_points(p0, p1, bulge, max_angle):
+    """points of a polyline arc segment from p0 to p1, without p1"""
+    dx, dy = p1[0] - p0[0], p1[1] - p0[1]
+    d = math.hypot(dx, dy)
+    if d == 0.0:
+        return [p0]
+    sweep = 4.0 * math.atan(bulge)
+    # the center lies on the chord's normal, left of it for an anticlockwise arc
+    h = d / 2.0 / math.tan(sweep / 2.0)
+    cx = (p0[0] + p1[0]) / 2.0 - dy / d * h
+    cy = (p0[1] + p1[1]) / 2.0 + dx / d * h
+    radius = math.hypot(p0[0] - cx, p0[1] - cy)
+    start = math.atan2(p0[1] - cy, p0[0] - cx)
+    return arc_points(cx, cy, radius, start, sweep, max_angle)[:-1]
+
+
+def _entity(kind, codes, max_angle):
+    """builds an Entity from the group codes of one entity, or None for other kinds"""
+    get = codes.get
+    layer = get(8, ['0'])[0]
+    if kind == 'LINE':
+        points = np.array([[get(10, [0.0])[0], get(20, [0.0])[0]],
+                           [get(11, [0.0])[0], get(21, [0.0])[0]]])
+        return Entity(kind, layer, points, False)
+
+    # entities in an object coordinate system with a -z extrusion are mirrored in x
+    flip = get(230, [1.0])[0] < 0.0
+    if kind in ('ARC', 'CIRCLE'):
+        cx, cy, radius = get(10, [0.0])[0], get(20, [0.0])[0], get(40, [0.0])[0]
+        if kind == 'CIRCLE':
+            start, sweep, closed = 0.0, 2.0 * math.pi, True
+        else:
+            start = math.radians(get(50, [0.0])[0])
+            end = math.radians(get(51, [360.0])[0])
+            sweep = (end - start) % (2.0 * math.pi) or 2.0 * math.pi
+            closed = False
+        points = arc_points(cx, cy, radius, start, sweep, max_angle)
+    elif kind == 'LWPOLYLINE':
+        xs, ys = get(10, []), get(20, [])
+        closed = bool(get(70, [0])[0] & 1)
+        bulges = codes.get('bulges')
+        if bulges:
+            vertices = list(zip(xs, ys))
+            if closed:
+                vertices.append(vertices[0])
+            pieces = []
+            for i in range(len(vertices) - 1):
+                b = bulges.get(i, 0.0)
+                if b:
+                    pieces.extend(_bulge_points(vertices[i], vertices[i + 1], b, max_angle))
+                else:
+                    pieces.append(vertices[i])
+            pieces.append(vertices[-1])
+            points = np.array(pieces, dtype=float).reshape(-1, 2)
+        else:
+            points = np.column_stack([xs, ys]).astype(float).reshape(-1, 2)
+            if closed and len(points):
+                points = np.vstack([points, points[:1]])
+    else:
+        return None
+
+    if flip:
+        points[:, 0] = -points[:, 0]
+    return Entity(kind, layer, points, closed)
+
+
+KINDS = ('LINE', 'LWPOLYLINE', 'ARC', 'CIRCLE')
+
+
+def _text(value):
+    return value.strip()
+
+
+# the group codes the entities are built from, all others are skipped unread
+_used = {8: _text, 10: float, 20: float, 11: float, 21: float, 40: float, 42: float,
+         50: float, 51: float, 70: int, 230: float}
+
+
+def _add(kind, codes, code, value):
+    """adds a (group code, value) pair read as it is to the codes of an entity"""
+    convert = _used.get(code)
+    if convert is None:
+        return
+    if code == 42 and kind == 'LWPOLYLINE':
+        # a bulge belongs to the vertex read last
+        codes.setdefault('bulges', {})[len(codes.get(10, ())) - 1] = float(value)
+    else:
+        codes.setdefault(code, []).append(convert(value))
+
+
+def _pair_records(pairs, kinds):
+    """
+    yields (kind, codes) for every entity of the given kinds in the ENTITIES section of
+    a stream of (group code, value) pairs
+    """
+    section = None
+    kind = None
+    codes = None
+    # group code of every distinct code as read
+    known = {}
+    for code, value in pairs:
+        number = known.get(code)
+        if number is None:
+            number = known[code] = int(code)
+        code = number
+
+        if code == 0:
+            if kind is not None:
+                yield kind, codes
+            kind = None
+            value = value.strip()
+            if value == 'SECTION':
+                section = 'start'
+            elif value == 'ENDSEC':
+                section = None
+            elif section == 'ENTITIES' and value in kinds:
+                kind = value
+                codes = {}
+        elif kind is not None:
+            _add(kind, codes, code, value)
+        elif section == 'start' and code == 2:
+            section = value.strip()
+
+
+def _ascii_blocks(f, block):
+    """
+    the pairs of an ASCII DXF a block at a time, as an array of their group codes and a
+    list of their value lines, every block ending where an entity starts. the lines of
+    the entity a block ends in are carried over to the next one; an entity is only
+    complete when the next one starts, so the last one of the file is dropped
+    """
+    rest = b''
+    while True:
+        # an entity longer than a block is read in blocks as long as what is carried
+        data = f.read(max(block, len(rest)))
+        lines = (rest + data).split(b'\n')
+        # the last line of a block, and a code line without its value, may go on in the
+        # next one
+        n = (len(lines) - 1 if data else len(lines)) // 2
+        codes = np.fromiter(map(_code_lines.__getitem__, lines[0:2 * n:2]), np.int64, n)
+        zero = np.flatnonzero(codes == 0)
+        if data and len(zero) < 2:
+            rest += data
+            continue
+        cut = zero[-1] if len(zero) else n
+        yield codes[:cut], lines[1:2 * cut:2]
+        if not data:
+            return
+        rest = b'\n'.join(lines[2 * cut:])
+
+
+def _ascii_batch(codes, values, section, kinds):
+    """
+    the entities of a block of an ASCII DXF as _batches returns them, from the group
+    codes and value lines of its pairs. section is the section the block starts in;
+    returns the batch and the section it ends in
+    """
+    zero = np.flatnonzero(codes == 0)
+    bounds = np.append(zero, len(codes)).tolist()
+    names = [values[i].strip() for i in zero.tolist()]
+
+    # the entities between a SECTION, named by its first code 2, and the next ENDSEC or
+    # SECTION are in that section
+    within = np.zeros(len(names), bool)
+    first = 0
+    marks = [k for k, name in enumerate(names) if name in (b'SECTION', b'ENDSEC')]
+    for k in marks + [len(names)]:
+        within[first:k] = section == 'ENTITIES'
+        if k == len(names):
+            break
+        named = [j for j in range(bounds[k] + 1, bounds[k + 1]) if codes[j] == 2]
+        section = None
+        if names[k] == b'SECTION' and named:
+            section = values[named[0]].decode('utf-8', 'replace').strip()
+        first = k + 1
+
+    wanted = dict((kind.encode('ascii'), kind) for kind in kinds)
+    kind = [wanted.get(name) for name in names]
+    line = within & np.array([found == 'LINE' for found in kind], dtype=bool)
+    other = within & ~line & np.array([found is not None for found in kind], dtype=bool)
+    records = []
+    for k in np.flatnonzero(other).tolist():
+        found = {}
+        for j in range(bounds[k] + 1, bounds[k + 1]):
+            _add(kind[k], found, int(codes[j]), values[j].decode('utf-8', 'replace'))
+        records.append((k, kind[k], found))
+
+    # the LINEs are built a group code at a time, from the LINE every pair belongs to
+    order = np.flatnonzero(line)
+    number = np.full(len(zero) + 1, -1)
+    number[order + 1] = np.arange(len(order))
+    owner = np.repeat(number, np.diff(np.append(0, bounds)))
+    ends = np.zeros((len(order), 4))
+    layers = np.full(len(order), '0', dtype=object)
+    for column, code in enumerate((8, 10, 20, 11, 21)):
+        # of repeated codes the first counts, so they are written last
+        i = np.flatnonzero((owner >= 0) & (codes == code))[::-1]
+        found = [values[j] for j in i.tolist()]
+        if code == 8:
+            texts = dict((value, value.decode('utf-8', 'replace').strip()) for value in set(found))
+            layers[owner[i]] = [texts[value] for value in found]
+        else:
+            ends[owner[i], column - 1] = np.array(found, dtype=float)
+    return (records, (order, layers, ends)), section
+
+
+def _batches(filename, kinds):
+    """
+    yields the entities of the given kinds in the ENTITIES section of a DXF file a
+    batch at a time, as (records, lines): the LINEs as (order, layers, ends), with
+    ends an (n, 4) array of x0 y0 x1 y1, and the others as (order, kind, codes), with
+    order numbering the entities of the batch
+    """
+    f = open(filename, 'rb')
+    with f:
+        if not _binary(f):
+            section = None
+            for codes, values in _ascii_blocks(f, BLOCK_SIZE):
+                batch, section = _ascii_batch(codes, values, section, kinds)
+                yield batch
+            return
+
+        def batch():
+            return records, (np.array(order, dtype=int), np.array(layers, dtype=object),
+                             np.array(ends, dtype=float).reshape(-1, 4))
+
+        records, order, layers, ends = [], [], [], []
+        for kind, codes in _pair_records(_binary_tokens(f), kinds):
+            k = len(records) + len(order)
+            if kind == 'LINE':
+                get = codes.get
+                order.append(k)
+                layers.append(get(8, ['0'])[0])
+                ends.append((get(10, [0.0])[0], get(20, [0.0])[0], get(11, [0.0])[0], get(21, [0.0])[0]))
+            else:
+                records.append((k, kind, codes))
+            if k + 1 == BATCH_SIZE:
+                yield batch()
+                records, order, layers, ends = [], [], [], []
+        yield batch()
+
+
+def _records(filename, kinds):
+    """yields (kind, codes) for every entity of the given kinds in the ENTITIES section"""
+    for records, (order, layers, ends) in _batches(filename, kinds):
+        lines = ((k, 'LINE', {8: [layer], 10: [x0], 20: [y0], 11: [x1], 21: [y1]})
+                 for k, layer, (x0, y0, x1, y1) in zip(order.tolist(), layers, ends.tolist()))
+        for _, kind, codes in heapq.merge(records, lines):
+            yield kind, codes
+
+
+def entities(filename, max_angle=math.radians(5.0), kinds=KINDS):
+    """yields the LINE, LWPOLYLINE, ARC and CIRCLE entities of a DXF file's ENTITIES section"""
+    for kind, codes in _records(filename, kinds):
+        entity = _entity(kind, codes, max_angle)
+        if entity is not None:
+            yield entity
+
+
+def _walk(order, bounds, node, m):
+    """
+    the chains of chain(), found one at a time: from every piece not used yet the chain
+    goes on from its end, then back from its start, each time with the first piece not
+    used yet whose end meets it. returns the end every piece is entered at in chain
+    order, the number of pieces of every chain and the place of its first piece
+    """
+    bounds = bounds.tolist()
+    # the ends at a node before free[n] belong to pieces already used
+    free = bounds[:-1]
+    order = order.tolist()
+    # the node at the other end of every end
+    other = np.concatenate([node[m:], node[:m]]).tolist()
+    node = node.tolist()
+    used = [False] * m
+
+    def take(n):
+        """the first end at node n of a piece not used yet, which is then used, or None"""
+        for k in range(free[n], bounds[n + 1]):
+            e = order[k]
+            if not used[e % m]:
+                used[e % m] = True
+                free[n] = k + 1
+                return e
+        free[n] = bounds[n + 1]
+        return None
+
+    entered, sizes, heads = [], [], []
+    for i in range(m):
+        if used[i]:
+            continue
+        used[i] = True
+        after, before = [], []
+        first, last = node[i], node[i + m]
+        while True:
+            e = take(last)
+            if e is None:
+                break
+            after.append(e)
+            last = other[e]
+        while first != last:
+            e = take(first)
+            if e is None:
+                break
+            before.append(e)
+            first = other[e]
+        # the pieces before piece i are entered at the other end than the one taken
+        entered.extend((e + m) % (2 * m) for e in reversed(before))
+        entered.append(i)
+        entered.extend(after)
+        sizes.append(len(before) + 1 + len(after))
+        heads.append(len(before))
+    return np.array(entered, dtype=np.intp), np.array(sizes), np.array(heads)
+
+
+def _paths(order, bounds, m):
+    """
+    the chains of _walk when no more than two ends meet anywhere: the piece that goes
+    on from an end is then the one whose end meets it, if it is not used yet. a run of
+    pieces that each start where the one before ends, like the LINEs of an outline
+    written in order, is always chained as it is, so the walk goes from run to run
+    """
+    partner = np.full(2 * m, -1)
+    pair = bounds[np.flatnonzero(np.diff(bounds) == 2)]
+    partner[order[pair]] = order[pair + 1]
+    partner[order[pair + 1]] = order[pair]
+
+    # the first and last piece of every run, and the run of every piece; the start of a
+    # run can only meet the start or end of a run, which is where the walk goes on
+    first = np.flatnonzero(np.append(True, partner[m:2 * m - 1] != np.arange(1, m)))
+    last = np.append(first[1:], m) - 1
+    r = len(first)
+    run = np.repeat(np.arange(r), last + 1 - first)
+    meets = partner[np.concatenate([first, last + m])]
+    meets = np.where(meets < 0, -1, run[meets % m] + r * (meets >= m)).tolist()
+    used = [False] * r
+
+    entered, sizes, heads = [], [], []
+    for i in range(r):
+        if used[i]:
+            continue
+        used[i] = True
+        after, before = [], []
+        for chained, e in ((after, i + r), (before, i)):
+            while True:
+                e = meets[e]
+                if e < 0 or used[e % r]:
+                    break
+                used[e % r] = True
+                chained.append(e)
+                e = (e + r) % (2 * r)
+        entered.extend((e + r) % (2 * r) for e in reversed(before))
+        entered.append(i)
+        entered.extend(after)
+        sizes.append(len(before) + 1 + len(after))
+        heads.append(len(before))
+
+    # the runs back as pieces: a run entered at its end is entered at the ends of its
+    # pieces, last to first
+    entered, sizes, heads = np.array(entered, dtype=np.intp), np.array(sizes), np.array(heads)
+    runs, back = entered % r, entered >= r
+    length = (last + 1 - first)[runs]
+    before = np.cumsum(length) - length
+    step = np.arange(length.sum()) - np.repeat(before, length)
+    pieces = np.where(np.repeat(back, length), np.repeat(last[runs], length) - step,
+                      np.repeat(first[runs], length) + step)
+    starts = np.cumsum(sizes) - sizes
+    before = np.append(before, length.sum())
+    return (pieces + m * np.repeat(back, length), before[starts + sizes] - before[starts],
+            before[starts + heads] - before[starts])
+
+
+def chain(pieces, tolerance=1e-6):
+    """
+    joins open point arrays whose ends lie within tolerance of each other into as few
+    polylines as possible. pieces are a list of (n, 2) arrays, or an (m, n, 2) array of
+    pieces of as many points each, like the LINEs of a file. returns a list of (points,
+    closed).
+    """
+    m = len(pieces)
+    if not m:
+        return []
+
+    # number the distinct end positions; end e < m is the start of piece e, e >= m the
+    # end of piece e - m
+    if isinstance(pieces, np.ndarray):
+        ends = np.concatenate([pieces[:, 0], pieces[:, -1]]).astype(float)
+    else:
+        ends = np.array([p[0] for p in pieces] + [p[-1] for p in pieces], dtype=float)
+    keys = np.round(ends / tolerance).astype(np.int64)
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    sorted_keys = keys[order]
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)
+    node = np.empty(len(order), dtype=np.intp)
+    node[order] = np.cumsum(new) - 1
+    # the ends at node n are order[bounds[n]:bounds[n+1]]
+    bounds = np.append(np.nonzero(new)[0], len(order))
+
+    if np.diff(bounds).max() <= 2:
+        entered, sizes, heads = _paths(order, bounds, m)
+    else:
+        entered, sizes, heads = _walk(order, bounds, node, m)
+    starts = np.cumsum(sizes) - sizes
+    closed = node[entered[starts]] == node[(entered[starts + sizes - 1] + m) % (2 * m)]
+
+    # pieces before the first piece of a chain lose their last point, those after it
+    # their first
+    if isinstance(pieces, np.ndarray):
+        turned = pieces[entered % m]
+        turned[entered >= m] = turned[entered >= m, ::-1]
+        ahead = np.arange(len(entered)) - np.repeat(starts, sizes) <= np.repeat(heads, sizes)
+        points = np.where(ahead[:, None, None], turned[:, :-1], turned[:, 1:]).reshape(-1, 2)
+        k = pieces.shape[1] - 1
+        first = starts + heads
+        points = np.insert(points, (first + 1) * k, turned[first, -1], axis=0)
+        chains = np.split(points, np.cumsum(sizes * k + 1)[:-1])
+    else:
+        chains = []
+        for start, size, head in zip(starts.tolist(), sizes.tolist(), heads.tolist()):
+            turned = [pieces[e % m] if e < m else pieces[e % m][::-1] for e in entered[start:start + size].tolist()]
+            parts = [p[:-1] for p in turned[:head]] + [turned[head]] + [p[1:] for p in turned[head + 1:]]
+            chains.append(np.vstack(parts))
+    return [(points, len(points) > 2 and c) for points, c in zip(chains, closed.tolist())]
+
+
+def read_dxf(filename, tolerance=1e-6, max_angle=math.radians(5.0), join=True):
+    """
+    reads the outlines of a DXF file as a list of Profiles, each an (n, 2) point array
+    with its layer and whether it is closed. closed entities come out as they are; with
+    join, the open ones of each layer are chained where their ends meet within
+    tolerance.
+    """
+    if not join:
+        return [Profile(e.points, e.layer, e.closed) for e in entities(filename, max_angle)]
+
+    profiles = []
+    pieces = collections.OrderedDict()
+    lines = collections.OrderedDict()
+    for records, (_, layers, ends) in _batches(filename, KINDS):
+        for _, kind, codes in records:
+            e = _entity(kind, codes, max_angle)
+            if e.closed:
+                profiles.append(Profile(e.points, e.layer, e.closed))
+            else:
+                pieces.setdefault(e.layer, []).append(e.points)
+        # lines come as arrays, and go to their layers in the order the layers appear
+        distinct, first = np.unique(layers, return_index=True) if len(layers) else ((), ())
+        for layer in [distinct[i] for i in np.argsort(first)]:
+            lines.setdefault(layer, []).append(ends[layers == layer])
+
+    for layer, values in lines.items():
+        values = np.concatenate(values).reshape(-1, 2, 2)
+        # lines alone are chained as one array
+        pieces[layer] = pieces[layer] + list(values) if layer in pieces else values
+    for layer, layer_pieces in pieces.items():
+        for points, closed in chain(layer_pieces, tolerance):
+            profiles.append(Profile(points, layer, closed))
+    return profiles
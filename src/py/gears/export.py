@@ -1,10 +1,49 @@
 # http://jamesgregson.blogspot.com/2012/05/python-involute-spur-gear-script.html
 
-def export_svg( px, py, filename, scale=1.0 ):
+import math
+
+try:
+    from . import instrument
+except (ImportError, ValueError):
+    # run as a script inside Rhino
+    import instrument
+
+def export_svg( px, py, filename, scale=1.0, precision=None, resolution=None ):
     """write output as svg, for laser-cutters, graphic design, etc.
+
+    with a precision (decimal places) or a machine resolution (smallest step, e.g. 0.01)
+    the outline is written as a compact svg_path instead of a polyline
     """
+    if resolution is not None:
+        precision = svg_precision( resolution )
+
+    t = instrument.start()
+    text = svg_text( px, py, scale, precision )
     out = open( filename, 'w' )
-    
+    out.write( text )
+    if t is not None:
+        instrument.stop( 'export_svg', t, len(px), len(text) )
+    out.close()
+
+def svg_text( px, py, scale=1.0, precision=None ):
+    """the svg file export_svg writes
+    """
+    head, sx, sy = _svg_frame( px, py, scale )
+    out = [ head ]
+    if precision is None:
+        out.append('<polyline style="fill:none;stroke:black;stroke-width:1" points="' )
+        out.append( svg_points( px, py, scale, sx, sy ) )
+    else:
+        out.append('<path style="fill:none;stroke:black;stroke-width:1" d="' )
+        out.append( svg_path( px, py, scale, sx, sy, precision ) )
+    out.append('" />\n' ) 
+    out.append('</svg>\n')
+    return ''.join( out )
+
+def _svg_frame( px, py, scale ):
+    """the start of an svg file framing the points, and the move dx, dy they are
+    written with
+    """
     minx = min( px )
     maxx = max( px )
     miny = min( py )
@@ -19,73 +58,239 @@ def export_svg( px, py, filename, scale=1.0 ):
     miny = scale*(ceny - sy)
     maxy = scale*(ceny + sy)
     
-    out.write('<?xml version="1.0" standalone="no" ?>\n' )
-    out.write('<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
-    out.write('<svg xmlns="http://www.w3.org/2000/svg" version="1.1" x="%fpx" y="%fpx" width="%fpx" height="%fpx">\n' % (minx, miny, maxx-minx, maxy-miny) )
-    out.write('<polyline style="fill:none;stroke:black;stroke-width:1" points="' );
-    
-    for i in range( 0, len(px) ):
-        out.write( '%f,%f ' % ( scale*(px[i]+sx), scale*(py[i]+sy) ) )
-    
-    out.write('" />\n' ) 
+    head = '<?xml version="1.0" standalone="no" ?>\n'
+    head += '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n'
+    head += '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" x="%fpx" y="%fpx" width="%fpx" height="%fpx">\n' % (minx, miny, maxx-minx, maxy-miny)
+    return head, sx, sy
+
+def export_svg_outlines( outlines, filename, scale=1.0, precision=3 ):
+    """write several (px, py) outlines, e.g. a part and its holes, into one svg file
+    as a path each, placed as export_svg places a single outline
+    """
+    head, sx, sy = _svg_frame( [ x for px, py in outlines for x in px ],
+                               [ y for px, py in outlines for y in py ], scale )
+    out = open( filename, 'w' )
+    out.write( head )
+    for px, py in outlines:
+        out.write('<path style="fill:none;stroke:black;stroke-width:1" d="' )
+        out.write( svg_path( px, py, scale, sx, sy, precision ) )
+        out.write('" />\n' )
     out.write('</svg>\n')
     out.close()
 
+def svg_points( px, py, scale=1.0, dx=0.0, dy=0.0 ):
+    """format points as the points attribute of an svg polyline, moved by dx, dy and scaled
+    """
+    values = _interleave( [ scale*(x+dx) for x in px ], [ scale*(y+dy) for y in py ] )
+    return '%f,%f ' * len(px) % tuple( values )
+
+def _interleave( *columns ):
+    """one flat list of the rows of equally long columns, for formatting a whole
+    outline with a single % operation
+    """
+    k = len(columns)
+    values = [ None ] * ( k*len(columns[0]) )
+    for i in range( 0, k ):
+        values[i::k] = columns[i]
+    return values
+
+def svg_precision( resolution ):
+    """decimal places needed to write coordinates at a machine resolution, 2 for 0.01
+    """
+    return max( 0, int( math.ceil( -math.log10( resolution ) - 1e-9 ) ) )
+
+def _svg_number( q, precision ):
+    """shortest form of the integer q divided by 10**precision: -.5 for -0.50
+    """
+    s = str( abs(q) )
+    if precision:
+        s = s.rjust( precision+1, '0' )
+        whole, frac = s[:-precision], s[-precision:].rstrip('0')
+        if whole == '0' and frac:
+            whole = ''
+        s = whole + ( '.' + frac if frac else '' )
+    return '-' + s if q < 0 else s
+
+def svg_path( px, py, scale=1.0, dx=0.0, dy=0.0, precision=3 ):
+    """format points as the d attribute of an svg path, moved by dx, dy and scaled.
+
+    every point is rounded to precision decimals first and written as the move from
+    the rounded point before it, so the rounding never accumulates: the path visits
+    exactly the rounded points. repeated commands, separators and zeros are left out,
+    points that round onto the one before are dropped, and a path that ends where it
+    starts is closed with z.
+    """
+    f = 10**precision
+    qx = [ int( round( scale*(x+dx)*f ) ) for x in px ]
+    qy = [ int( round( scale*(y+dy)*f ) ) for y in py ]
+    if not qx:
+        return ''
+
+    closed = len(qx) > 2 and qx[-1] == qx[0] and qy[-1] == qy[0]
+    while closed and len(qx) > 1 and qx[-1] == qx[0] and qy[-1] == qy[0]:
+        qx, qy = qx[:-1], qy[:-1]
+
+    names = {}
+    out = []
+    command = None
+    dot = None
+    for i in range( 0, len(qx) ):
+        if i == 0:
+            values, c = ( qx[0], qy[0] ), 'M'
+        else:
+            ddx = qx[i] - qx[i-1]
+            ddy = qy[i] - qy[i-1]
+            if ddy == 0:
+                if not ddx:
+                    continue
+                values, c = ( ddx, ), 'h'
+            elif ddx == 0:
+                values, c = ( ddy, ), 'v'
+            else:
+                values, c = ( ddx, ddy ), 'l'
+        if c != command:
+            out.append( c )
+            command = c
+            dot = None
+        for q in values:
+            if q not in names:
+                names[q] = _svg_number( q, precision )
+            s = names[q]
+            # a separator is only needed where the number would run into the last one:
+            # a digit always would, a point only after a number without one
+            if dot is not None and ( s[0].isdigit() or ( s[0] == '.' and not dot ) ):
+                out.append( ' ' )
+            out.append( s )
+            dot = '.' in s
+    if closed:
+        out.append( 'z' )
+    return ''.join( out )
+
 def export_dxf(px, py, filename, scale=1.0):
     """
     write output as dxf profile in x-y plane, for use with OpenSCAD
     """
+    t = instrument.start()
+    text = dxf_text( format_coordinates( px, scale ), format_coordinates( py, scale ), filename )
     out = open( filename, 'w' )
-    out.write('  0\n')
-    out.write('SECTION\n')
-    out.write('  2\n')
-    out.write('HEADER\n')
-    out.write('999\n')
-    out.write('%s by gears.py\n' % filename )
-    out.write('999\n')
-    out.write('contact james.gregson@gmail.com for gears.py details\n')
-    out.write('  0\n')
-    out.write('ENDSEC\n')
-    out.write('  0\n')
-    out.write('SECTION\n')
-    out.write('  2\n')
-    out.write('TABLES\n')
-    out.write('  0\n')
-    out.write('ENDSEC\n')
-    out.write('  0\n')
-    out.write('SECTION\n')
-    out.write('  2\n')
-    out.write('BLOCKS\n')
-    out.write('  0\n')
-    out.write('ENDSEC\n')
-    out.write('  0\n')
-    out.write('SECTION\n')
-    out.write('  2\n')
-    out.write('ENTITIES\n')
-    
-    for i in range( 0, len(px)-1 ):
-        out.write('  0\n')
-        out.write('LINE\n')
-        out.write('  8\n')
-        out.write('  2\n')
-        out.write(' 62\n')
-        out.write('  4\n')
-        out.write(' 10\n')
-        out.write('%f\n' % (scale*px[i]))
-        out.write(' 20\n')
-        out.write('%f\n' % (scale*py[i]))
-        out.write(' 30\n')
-        out.write('0.0\n')
-        out.write(' 11\n')
-        out.write('%f\n' % (scale*px[i+1]))
-        out.write(' 21\n')
-        out.write('%f\n' % (scale*py[i+1]))
-        out.write(' 31\n')
-        out.write('0.0\n')
-    
-    
-    out.write('  0\n')
-    out.write('ENDSEC\n')
-    out.write('  0\n')
-    out.write('EOF\n')
+    out.write( text )
+    if t is not None:
+        instrument.stop( 'export_dxf', t, len(px), len(text) )
     out.close()
+
+_DXF_HEADER = '''  0
+SECTION
+  2
+HEADER
+999
+%s by gears.py
+999
+contact james.gregson@gmail.com for gears.py details
+  0
+ENDSEC
+  0
+SECTION
+  2
+TABLES
+  0
+ENDSEC
+  0
+SECTION
+  2
+BLOCKS
+  0
+ENDSEC
+  0
+SECTION
+  2
+ENTITIES
+'''
+
+_DXF_LINE = '''  0
+LINE
+  8
+  2
+ 62
+  4
+ 10
+%s
+ 20
+%s
+ 30
+0.0
+ 11
+%s
+ 21
+%s
+ 31
+0.0
+'''
+
+_DXF_FOOTER = '''  0
+ENDSEC
+  0
+EOF
+'''
+
+def format_coordinates( values, scale=1.0 ):
+    """format scaled coordinates as the '%f' strings dxf and gcode files are written with.
+
+    the strings only depend on the values and the scale, so one list serves every
+    format written from the same outline
+    """
+    if not len(values):
+        return []
+    return ( '%f ' * len(values) % tuple( [ scale*v for v in values ] ) ).split()
+
+def dxf_text( xs, ys, filename ):
+    """the dxf file export_dxf writes, one LINE per segment, from formatted coordinates
+    """
+    return _DXF_HEADER % filename + dxf_lines( xs, ys ) + _DXF_FOOTER
+
+def dxf_lines( xs, ys ):
+    """the LINE entities of an outline, one per segment, from formatted coordinates
+    """
+    n = max( 0, len(xs)-1 )
+    return _DXF_LINE * n % tuple( _interleave( xs[:n], ys[:n], xs[1:], ys[1:] ) ) if n else ''
+
+def export_dxf_outlines( outlines, filename, scale=1.0 ):
+    """
+    write several (px, py) outlines, e.g. a part and its holes, into one dxf file
+    """
+    out = open( filename, 'w' )
+    out.write( _DXF_HEADER % filename )
+    for px, py in outlines:
+        out.write( dxf_lines( format_coordinates( px, scale ), format_coordinates( py, scale ) ) )
+    out.write( _DXF_FOOTER )
+    out.close()
+
+def export_gcode( px, py, filename, scale=1.0, feed=100.0, units=None ):
+    """
+    write output as gcode cutting the profile once, for laser, plasma and drag-knife
+    cutters: a rapid move to the start, tool on (M3), feed moves along the outline and
+    tool off (M5). units 'mm' or 'in' adds G21 or G20, otherwise the machine default
+    applies
+    """
+    t = instrument.start()
+    text = gcode_text( format_coordinates( px, scale ), format_coordinates( py, scale ),
+                       filename, feed, units )
+    out = open( filename, 'w' )
+    out.write( text )
+    if t is not None:
+        instrument.stop( 'export_gcode', t, len(px), len(text) )
+    out.close()
+
+_GCODE_UNITS = { None: '', 'mm': 'G21\n', 'in': 'G20\n' }
+
+def gcode_text( xs, ys, name, feed=100.0, units=None ):
+    """the gcode file export_gcode writes, from formatted coordinates
+    """
+    head = '(%s by gears.py)\nG90\n%s' % ( name, _GCODE_UNITS[units] )
+    if not xs:
+        return head + 'M2\n'
+    moves = 'G0 X%s Y%s\nM3\n' % ( xs[0], ys[0] )
+    if len(xs) > 1:
+        # the feed rate is modal, given once with the first cut
+        moves += 'G1 X%s Y%s F%g\n' % ( xs[1], ys[1], feed )
+        moves += 'G1 X%s Y%s\n' * ( len(xs)-2 ) % tuple( _interleave( xs[2:], ys[2:] ) )
+    return head + moves + 'M5\nM2\n'
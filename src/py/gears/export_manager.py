@@ -0,0 +1,150 @@
+# Writing one outline in several formats at once.
+#
+#     with ExportManager() as manager:
+#         for name, px, py in catalog:
+#             manager.submit(px, py, 'out/' + name, ('svg', 'dxf', 'gcode', 'stl'))
+#     paths = manager.results()
+#
+# Every format of an outline is formatted and written by its own task on a thread
+# pool, so the file writes of one part overlap the formatting of the next. The
+# coordinates are formatted once per part and shared: dxf and gcode files are
+# written from the same '%f' strings (export.format_coordinates), which is most of
+# the work of either. stl is built by numpy from the points, and svg keeps its own
+# formatting (export.svg_text) as it moves the points first.
+#
+# The output is byte for byte what export_svg, export_dxf, export_gcode and
+# stl.export_stl write.
+
+import collections
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import instrument
+from .export import dxf_text, format_coordinates, gcode_text, svg_precision, svg_text
+from .stl import extrude, stl_bytes
+
+
+FORMATS = ('svg', 'dxf', 'gcode', 'stl')
+
+EXTENSIONS = {'svg': 'svg', 'dxf': 'dxf', 'gcode': 'nc', 'stl': 'stl'}
+
+# parts in flight per worker thread, bounds the memory held by unwritten files
+QUEUE_DEPTH = 4
+
+
+Coordinates = collections.namedtuple('Coordinates', 'xs ys')
+
+
+def _write(fmt, filename, text):
+    t = instrument.start()
+    if isinstance(text, bytes):
+        out = open(filename, 'wb')
+    else:
+        out = open(filename, 'w')
+    with out:
+        out.write(text)
+    instrument.stop('write_' + fmt, t, 0, len(text))
+    return filename
+
+
+class ExportManager(object):
+    """
+    writes outlines in several formats on a pool of threads. submit() queues one
+    outline and returns at once, unless QUEUE_DEPTH parts per worker are already
+    waiting; results() waits for everything submitted and returns the paths written,
+    in order. use it as a context manager or call close() to stop the threads.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        self._pool = ThreadPoolExecutor(self.workers)
+        self._pending = collections.deque()
+        self._done = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown()
+
+    def submit(self, px, py, basename, formats=FORMATS, scale=1.0, precision=None,
+               resolution=None, thickness=1.0, feed=100.0, units=None):
+        """
+        queues writing px, py to basename plus the extension of every format. svg takes
+        precision or resolution as export_svg does, stl the thickness of the extruded
+        plate and gcode the feed and units of export_gcode; scale applies to all
+        """
+        for fmt in formats:
+            if fmt not in EXTENSIONS:
+                raise ValueError("unknown format %r, expected one of %s" % (fmt, ', '.join(FORMATS)))
+        if resolution is not None:
+            precision = svg_precision(resolution)
+        while len(self._pending) >= QUEUE_DEPTH * self.workers:
+            self._done.append([f.result() for f in self._pending.popleft()])
+
+        # the coordinate strings are formatted by the first task that needs them; tasks
+        # start in submission order, so it is running before anyone waits for it
+        shared = None
+        if 'dxf' in formats or 'gcode' in formats:
+            shared = self._pool.submit(self._coordinates, px, py, scale)
+        futures = [self._pool.submit(self._export, fmt, px, py, scale, shared,
+                                     '%s.%s' % (basename, EXTENSIONS[fmt]),
+                                     precision, thickness, feed, units)
+                   for fmt in formats]
+        self._pending.append(futures)
+        return futures
+
+    def results(self):
+        """waits for every submitted part and returns their lists of paths, in order"""
+        while self._pending:
+            self._done.append([f.result() for f in self._pending.popleft()])
+        done, self._done = self._done, []
+        return done
+
+    @staticmethod
+    def _coordinates(px, py, scale):
+        t = instrument.start()
+        xs, ys = format_coordinates(px, scale), format_coordinates(py, scale)
+        instrument.stop('format_coordinates', t, len(px))
+        return Coordinates(xs, ys)
+
+    @staticmethod
+    def _export(fmt, px, py, scale, shared, filename, precision, thickness, feed, units):
+        if shared is not None:
+            shared = shared.result()
+        t = instrument.start()
+        if fmt == 'svg':
+            text = svg_text(px, py, scale, precision)
+        elif fmt == 'dxf':
+            text = dxf_text(shared.xs, shared.ys, filename)
+        elif fmt == 'gcode':
+            text = gcode_text(shared.xs, shared.ys, filename, feed, units)
+        else:
+            text = stl_bytes(extrude(scale * np.column_stack([px, py]), thickness), filename)
+        instrument.stop('format_' + fmt, t, len(px))
+        return _write(fmt, filename, text)
+
+
+def export_all(px, py, basename, formats=FORMATS, **options):
+    """writes one outline in every format at once, returns the paths"""
+    with ExportManager(len(formats)) as manager:
+        manager.submit(px, py, basename, formats, **options)
+        return manager.results()[0]
+
+
+def export_catalog(parts, directory='.', formats=FORMATS, workers=None, **options):
+    """
+    writes every (name, px, py) of parts in every format to directory, returns the
+    lists of paths in order
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with ExportManager(workers) as manager:
+        for name, px, py in parts:
+            manager.submit(px, py, os.path.join(directory, name), formats, **options)
+        return manager.results()
@@ -2,6 +2,12 @@
 
 import math
 
+try:
+    from . import instrument
+except (ImportError, ValueError):
+    # run as a script inside Rhino
+    import instrument
+
 # =================================================================================
 # =================================================================================
 # Spur-gear generation script
@@ -53,9 +59,9 @@ def gears_circular_tooth_thickness(pitch, backlash=0.05):
     return gears_circular_pitch(pitch) / (2.0+backlash)
 
 
-def gears_circular_tooth_angle(teeth, pitch):
+def gears_circular_tooth_angle(teeth, pitch, backlash=0.05):
     """compute the circular tooth angle of a gear with a given"""
-    return gears_circular_tooth_thickness(pitch) * 2.0 / gears_pitch_diameter(teeth, pitch)
+    return gears_circular_tooth_thickness(pitch, backlash) * 2.0 / gears_pitch_diameter(teeth, pitch)
 
 
 def gears_addendum(pitch):
@@ -192,7 +198,7 @@ def gears_translate( dx, dy, ix, iy ):
     return x, y
     
 
-def make_tooth(pressure_angle, teeth, pitch):
+def make_tooth(pressure_angle, teeth, pitch, backlash=0.05, steps=30):
     """generates a single tooth profile of a spur gear"""
 
     base_diameter = gears_base_diameter(pressure_angle, teeth, pitch ) / 2.0
@@ -200,31 +206,36 @@ def make_tooth(pressure_angle, teeth, pitch):
     root_diameter = gears_root_diameter(teeth, pitch) / 2.0
     pitch_diameter = gears_pitch_diameter(teeth, pitch)
 
-    ix, iy, itheta = generate_involute_curve(base_diameter, outer_diameter, math.pi/2.1 ) # 2.1??
+    t = instrument.start()
+    ix, iy, itheta = generate_involute_curve(base_diameter, outer_diameter, math.pi/2.1, steps) # 2.1??
 
     ix.insert(0, min(base_diameter, root_diameter))
     iy.insert(0, 0.0)
     itheta.insert(0, 0.0)
+    instrument.stop('involute', t, len(ix))
 
+    t = instrument.start()
     ix, iy = gears_align_involute(pitch_diameter, ix, iy, itheta)
+    instrument.stop('alignment', t, len(ix))
 
+    t = instrument.start()
     mx, my = gears_mirror_involute(ix, iy)
-    mx, my = gears_rotate(gears_circular_tooth_angle(teeth, pitch ), mx, my )
+    mx, my = gears_rotate(gears_circular_tooth_angle(teeth, pitch, backlash), mx, my )
 
     ix.extend(mx)
     iy.extend(my)
+    instrument.stop('mirroring', t, len(ix))
 
     return ix, iy
 
 
-def make_gear(diameter, pressure_angle, teeth, pitch):
+def make_gear(diameter, pressure_angle, teeth, pitch, backlash=0.05, steps=30):
     """
     generates a spur gear with a given pressure angle, number of teeth and pitch
     """
-    tx, ty = make_tooth(pressure_angle, teeth, pitch)
-    print(tx)
-    print(ty)
+    tx, ty = make_tooth(pressure_angle, teeth, pitch, backlash, steps)
 
+    t = instrument.start()
     x = []
     y = []
 
@@ -236,9 +247,12 @@ def make_gear(diameter, pressure_angle, teeth, pitch):
 
     x.append(x[0])
     y.append(y[0])
+    instrument.stop('replication', t, len(x))
     
+    t = instrument.start()
     x = [e * diameter for e in x]
     y = [e * diameter for e in y]
+    instrument.stop('scaling', t, len(x))
 
     return zip(x, y)
 
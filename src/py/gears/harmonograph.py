@@ -0,0 +1,45 @@
+# Harmonograph traces.
+#
+# A harmonograph draws with pendulums: every coordinate of the pen is a sum of
+# damped swings,
+#
+#     x(t) = sum of amplitude * sin(frequency * t + phase) * exp(-damping * t)
+#
+# Slow damping and close frequencies give the long, dense drawings, millions of
+# points, that are generated in chunks into a trace_store.Trace.
+#
+# https://en.wikipedia.org/wiki/Harmonograph
+
+import collections
+
+import numpy as np
+
+from .trace_store import WINDOW
+
+
+Pendulum = collections.namedtuple('Pendulum', 'amplitude frequency phase damping')
+
+
+def _swing(t, pendulums):
+    s = np.zeros_like(t)
+    for amplitude, frequency, phase, damping in pendulums:
+        s += amplitude * np.sin(frequency * t + phase) * np.exp(-damping * t)
+    return s
+
+
+def harmonograph(t, x_pendulums, y_pendulums):
+    """(n, 2) pen positions at the times t of the pendulums moving x and y"""
+    t = np.asarray(t, dtype=float)
+    return np.column_stack([_swing(t, x_pendulums), _swing(t, y_pendulums)])
+
+
+def write_harmonograph(trace, x_pendulums, y_pendulums, duration, rate=1000.0, chunk=WINDOW):
+    """
+    appends the drawing of duration seconds, rate points a second, to trace as one new
+    curve, chunk points at a time. returns the number of points
+    """
+    n = int(duration * rate) + 1
+    for start in range(0, n, chunk):
+        t = np.arange(start, min(start + chunk, n)) / float(rate)
+        trace.append(harmonograph(t, x_pendulums, y_pendulums), continues=start > 0)
+    return n
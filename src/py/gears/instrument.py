@@ -0,0 +1,139 @@
+# Opt-in timing of the stages of gear generation and export.
+#
+# Instrumented code brackets a stage with start() and stop():
+#
+#     t = instrument.start()
+#     ix, iy, itheta = generate_involute_curve(...)
+#     instrument.stop('involute', t, vertices=len(ix))
+#
+# While instrumentation is off, start() returns None and stop() returns at once, so
+# the cost is two function calls per stage. While it is on, every stage adds its
+# wall time, call count, vertex count and bytes written to a registry, and with
+# trace=True every call is also kept as an event for a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev).
+#
+#     with instrument.profiling():
+#         export_svg(...)
+#     print(instrument.stats())
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+_enabled = False
+_tracing = False
+_stages = {}
+_events = []
+_lock = threading.Lock()
+# IronPython 2.7 inside Rhino has no perf_counter
+_clock = getattr(time, 'perf_counter', time.time)
+_origin = _clock()
+
+
+def enable(trace=False):
+    """starts recording stages, and every single call as well with trace"""
+    global _enabled, _tracing
+    _enabled = True
+    _tracing = trace
+
+
+def disable():
+    """stops recording; what was recorded stays until reset"""
+    global _enabled, _tracing
+    _enabled = False
+    _tracing = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """forgets everything recorded so far"""
+    with _lock:
+        _stages.clear()
+        del _events[:]
+
+
+@contextlib.contextmanager
+def profiling(trace=False, clear=True):
+    """records stages for the duration of a with block, then restores the previous state"""
+    state = (_enabled, _tracing)
+    if clear:
+        reset()
+    enable(trace)
+    try:
+        yield
+    finally:
+        if state[0]:
+            enable(state[1])
+        else:
+            disable()
+
+
+def start():
+    """start time of a stage, or None while disabled"""
+    if _enabled:
+        return _clock()
+    return None
+
+
+def stop(name, started, vertices=0, nbytes=0):
+    """records a stage that began at started, a value from start()"""
+    if started is None:
+        return
+    end = _clock()
+    with _lock:
+        entry = _stages.get(name)
+        if entry is None:
+            entry = _stages[name] = [0, 0.0, 0, 0]
+        entry[0] += 1
+        entry[1] += end - started
+        entry[2] += vertices
+        entry[3] += nbytes
+        if _tracing:
+            _events.append((name, started, end - started, threading.current_thread().ident,
+                            vertices, nbytes))
+
+
+def stats():
+    """returns {stage: {'calls', 'seconds', 'vertices', 'bytes'}} for every recorded stage"""
+    with _lock:
+        return dict((name, {'calls': calls, 'seconds': seconds, 'vertices': vertices, 'bytes': nbytes})
+                    for name, (calls, seconds, vertices, nbytes) in _stages.items())
+
+
+def report():
+    """the recorded stages as a table, slowest first"""
+    rows = sorted(stats().items(), key=lambda item: -item[1]['seconds'])
+    lines = ['%-16s %8s %12s %12s %12s' % ('stage', 'calls', 'ms', 'vertices', 'bytes')]
+    for name, s in rows:
+        lines.append('%-16s %8d %12.3f %12d %12d'
+                     % (name, s['calls'], 1000.0 * s['seconds'], s['vertices'], s['bytes']))
+    return '\n'.join(lines)
+
+
+def dump_json(filename):
+    """writes stats() as JSON"""
+    with open(filename, 'w') as out:
+        json.dump(stats(), out, indent=1, sort_keys=True)
+
+
+def chrome_trace():
+    """the traced calls as a Chrome trace event dict (times in microseconds)"""
+    pid = os.getpid()
+    with _lock:
+        events = [{'name': name, 'cat': 'gears', 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': 1e6 * (started - _origin), 'dur': 1e6 * duration,
+                   'args': {'vertices': vertices, 'bytes': nbytes}}
+                  for name, started, duration, tid, vertices, nbytes in _events]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def dump_chrome_trace(filename):
+    """writes the traced calls in Chrome trace format; enable(trace=True) records them"""
+    with open(filename, 'w') as out:
+        json.dump(chrome_trace(), out)
@@ -21,6 +21,22 @@ def simple(r, steps, step):
     return l
 
 
+def write_trace(filename, curves=49, steps=10000):
+    """
+    writes the curves main() draws into a trace file (see trace_store), one chunk per
+    curve, for exporting or simplifying later without regenerating them
+    """
+    import numpy as np
+    from .trace_store import Trace
+
+    with Trace(filename, 'w') as trace:
+        for e in range(1, curves + 1):
+            theta = np.arange(steps) * (.1 / e)
+            x = e * (np.cos(theta) + theta * np.sin(theta))
+            y = e * (np.sin(theta) - theta * np.cos(theta))
+            trace.append(np.column_stack([x, y]))
+
+
 def main():
     import rhinoscriptsyntax as rs
     
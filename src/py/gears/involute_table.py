@@ -0,0 +1,122 @@
+# Involute function and its inverse over arrays.
+#
+# inv(a) = tan(a) - a gives the polar angle swept by an involute between the base
+# circle and the radius where its pressure angle is a. Going back from a polar
+# angle to a pressure angle has no closed form, so inv_inverse starts from a table
+# built at import and finishes with Newton steps.
+#
+# The table is uniform in inv(a)**(1/3), which is nearly linear in a for small
+# angles (inv(a) ~ a**3/3), so linear interpolation is already close.
+#
+# http://web.mit.edu/harishm/www/papers/involuteEWC.pdf
+
+import numpy as np
+
+
+TABLE_SIZE = 4096
+MAX_PRESSURE_ANGLE = 1.45   # radians, about 83 degrees
+
+
+def inv(alpha):
+    """involute function of a pressure angle in radians"""
+    alpha = np.asarray(alpha, dtype=float)
+    return np.tan(alpha) - alpha
+
+
+def _build_table():
+    """returns (cube root of inv, pressure angle) on a uniform grid"""
+    dense = np.linspace(0.0, MAX_PRESSURE_ANGLE, 16 * TABLE_SIZE)
+    u = np.cbrt(inv(dense))
+    grid = np.linspace(0.0, u[-1], TABLE_SIZE)
+    alpha = np.interp(grid, u, dense)
+    alpha = _newton(alpha, grid**3, 2)
+    alpha[0] = 0.0
+    for a in (grid, alpha):
+        a.setflags(write=False)
+    return grid, alpha
+
+
+def _newton(alpha, x, steps):
+    """refine pressure angles alpha so that inv(alpha) = x"""
+    for _ in range(steps):
+        t = np.tan(alpha)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = (t - alpha - x) / (t * t)
+        alpha = alpha - np.where(t != 0.0, step, 0.0)
+    return alpha
+
+
+_grid, _alpha = _build_table()
+
+
+_scale = (TABLE_SIZE - 1) / _grid[-1]
+_slope = np.append(np.diff(_alpha), 0.0)
+_max = _grid[-1]**3
+
+
+def inv_inverse(x, steps=1):
+    """
+    pressure angle in radians whose involute function is x. x may be any array;
+    values outside [0, inv(MAX_PRESSURE_ANGLE)] give nan.
+    """
+    x = np.asarray(x, dtype=float)
+
+    # the grid is uniform, so the cell is found without a search
+    pos = np.cbrt(x) * _scale
+    i = np.clip(pos.astype(np.intp), 0, TABLE_SIZE - 1)
+    alpha = _alpha[i] + (pos - i) * _slope[i]
+
+    alpha = _newton(alpha, x, steps)
+    return np.where((x >= 0.0) & (x <= _max), alpha, np.nan)
+
+
+def pressure_angle_at_radius(base_radius, radius):
+    """pressure angle in radians of an involute where it crosses a given radius"""
+    return np.arccos(np.asarray(base_radius, dtype=float) / radius)
+
+
+def involute_roll_angle(base_radius, radius):
+    """
+    roll angle (the theta of generate_involute_curve) at which an involute reaches a
+    given radius, used to clip a curve exactly at the outer circle
+    """
+    return np.sqrt((np.asarray(radius, dtype=float) / base_radius)**2 - 1.0)
+
+
+def involute_polar_angle(base_radius, radius):
+    """
+    polar angle of an involute where it crosses a given radius, measured from its
+    start on the base circle, used to align a curve at the pitch circle
+    """
+    return inv(pressure_angle_at_radius(base_radius, radius))
+
+
+def involute_radius(base_radius, polar_angle):
+    """radius at which an involute has turned through a given polar angle"""
+    return np.asarray(base_radius, dtype=float) / np.cos(inv_inverse(polar_angle))
+
+
+def involute_intersect_angle(inner_radius, outer_radius):
+    """
+    array version of getInvoluteIntersectAngle in doc/py/g2.py: the angle between
+    the points where an involute from inner_radius crosses inner_radius and outer_radius
+    """
+    return involute_polar_angle(inner_radius, outer_radius)
+
+
+def tooth_thickness_at_radius(radius, pitch_radius, thickness, pressure_angle):
+    """
+    circular thickness at radius of an involute tooth that is thickness thick on the
+    pitch circle. pressure_angle is in degrees, like in gx.
+    """
+    radius = np.asarray(radius, dtype=float)
+    alpha = np.radians(pressure_angle)
+    alpha_r = pressure_angle_at_radius(pitch_radius * np.cos(alpha), radius)
+    return 2.0 * radius * (thickness / (2.0 * pitch_radius) + inv(alpha) - inv(alpha_r))
+
+
+def pointed_tip_radius(pitch_radius, thickness, pressure_angle):
+    """radius at which the two flanks of an involute tooth meet"""
+    alpha = np.radians(pressure_angle)
+    base_radius = pitch_radius * np.cos(alpha)
+    return involute_radius(base_radius, thickness / (2.0 * pitch_radius) + inv(alpha))
@@ -0,0 +1,244 @@
+# Mesh analysis for pairs of spur gears from gx.
+#
+# Contact ratio, length of the line of action, backlash, sliding and kinematic
+# transmission error, computed as array expressions so that whole parameter
+# sweeps can be screened at once.
+#
+# Lengths are in the units of make_tooth (diameter = 1) unless a function takes
+# make_gear specs, which are (diameter, pressure_angle, teeth, pitch) tuples.
+#
+# https://www.bostongear.com/pdf/gear_theory.pdf
+
+import math
+
+import numpy as np
+
+from .gx import gears_circular_tooth_thickness, make_tooth
+from .involute_table import involute_polar_angle, tooth_thickness_at_radius
+
+
+def mesh_radii(pressure_angle, teeth, pitch):
+    """
+    returns (pitch, base, outer) radii of gears, broadcasting over array arguments
+    """
+    teeth = np.asarray(teeth, dtype=float)
+    pitch = np.asarray(pitch, dtype=float)
+    alpha = np.radians(pressure_angle)
+
+    rp = teeth / pitch / 2.0
+    rb = rp * np.cos(alpha)
+    ra = rp + 1.0 / pitch
+    return rp, rb, ra
+
+
+def mesh_metrics(pressure_angle, teeth1, teeth2, pitch, center_distance=None, backlash=0.05):
+    """
+    computes the contact geometry of two meshing gears.
+
+    every argument may be an array; they are broadcast together. center_distance
+    defaults to the standard one. returns a dict of arrays:
+
+        center_distance, operating_pressure_angle (degrees), line_of_action (length
+        of the path of contact), base_pitch, contact_ratio, backlash (circular, on the
+        operating pitch circle, negative when the teeth jam) and interference (a tip
+        reaches below the base circle of the other gear).
+    """
+    alpha = np.radians(pressure_angle)
+    rp1, rb1, ra1 = mesh_radii(pressure_angle, teeth1, pitch)
+    rp2, rb2, ra2 = mesh_radii(pressure_angle, teeth2, pitch)
+    teeth1 = np.asarray(teeth1, dtype=float)
+
+    a0 = rp1 + rp2
+    if center_distance is None:
+        a = a0
+    else:
+        a = np.asarray(center_distance, dtype=float)
+
+    alpha_w = np.arccos(np.clip(a0 * np.cos(alpha) / a, -1.0, 1.0))
+    tangent = a * np.sin(alpha_w)
+    approach = np.sqrt(ra2**2 - rb2**2)
+    recess = np.sqrt(ra1**2 - rb1**2)
+
+    line_of_action = approach + recess - tangent
+    base_pitch = 2.0 * math.pi * rb1 / teeth1
+
+    # tooth thickness moved from the cutting pitch circle to the operating one
+    thickness = gears_circular_tooth_thickness(1.0, backlash) / np.asarray(pitch, dtype=float)
+    rw1 = rb1 / np.cos(alpha_w)
+    rw2 = rb2 / np.cos(alpha_w)
+    sw1 = tooth_thickness_at_radius(rw1, rp1, thickness, pressure_angle)
+    sw2 = tooth_thickness_at_radius(rw2, rp2, thickness, pressure_angle)
+
+    return {
+        'center_distance': a * np.ones_like(line_of_action),
+        'operating_pressure_angle': np.degrees(alpha_w),
+        'line_of_action': line_of_action,
+        'base_pitch': base_pitch,
+        'contact_ratio': line_of_action / base_pitch,
+        'backlash': 2.0 * math.pi * rw1 / teeth1 - sw1 - sw2,
+        'interference': (approach > tangent) | (recess > tangent),
+    }
+
+
+def mesh_sliding(pressure_angle, teeth1, teeth2, pitch, center_distance=None, samples=50):
+    """
+    samples the path of contact of gear 1 driving gear 2 at unit angular speed.
+
+    returns a dict of arrays with a trailing axis of length samples:
+
+        position (distance from the pitch point along the line of action, negative
+        during approach), sliding_velocity, specific_sliding1 and specific_sliding2.
+    """
+    alpha = np.radians(pressure_angle)
+    rp1, rb1, ra1 = mesh_radii(pressure_angle, teeth1, pitch)
+    rp2, rb2, ra2 = mesh_radii(pressure_angle, teeth2, pitch)
+    ratio = np.asarray(teeth1, dtype=float) / np.asarray(teeth2, dtype=float)
+
+    if center_distance is None:
+        a = rp1 + rp2
+    else:
+        a = np.asarray(center_distance, dtype=float)
+    alpha_w = np.arccos(np.clip((rp1 + rp2) * np.cos(alpha) / a, -1.0, 1.0))
+    tangent = a * np.sin(alpha_w)
+
+    # distances from the tangent point on the base circle of gear 1
+    start = tangent - np.sqrt(ra2**2 - rb2**2)
+    end = np.sqrt(ra1**2 - rb1**2)
+    t = np.linspace(0.0, 1.0, samples)
+    g1 = start[..., None] + (end - start)[..., None] * t
+    g2 = tangent[..., None] - g1
+
+    # rolling speeds of the contact point over each flank
+    v1 = g1
+    v2 = ratio[..., None] * g2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zeta1 = (v1 - v2) / v1
+        zeta2 = (v2 - v1) / v2
+
+    return {
+        'position': g1 - (rb1 * np.tan(alpha_w))[..., None],
+        'sliding_velocity': v1 - v2,
+        'specific_sliding1': zeta1,
+        'specific_sliding2': zeta2,
+    }
+
+
+_flanks = {}
+
+
+def flank_deviation(pressure_angle, teeth, pitch, samples=8):
+    """
+    measures how far the polyline flank of make_tooth departs from a true involute.
+
+    returns (radius, excess) arrays sorted by radius, where excess is the material
+    added (positive) or missing along the line of action at that radius.
+    """
+    key = (pressure_angle, teeth, pitch, samples)
+    if key in _flanks:
+        return _flanks[key]
+
+    tx, ty = make_tooth(pressure_angle, teeth, pitch)
+    rp, rb, ra = (float(r) for r in mesh_radii(pressure_angle, teeth, pitch))
+
+    # the first half of the tooth is the aligned involute, led by the root point
+    half = len(tx) // 2
+    x = np.array(tx[1:half])
+    y = np.array(ty[1:half])
+
+    # sample along each chord so that the sag between vertices is seen
+    u = np.linspace(0.0, 1.0, samples, endpoint=False)
+    cx = (x[:-1, None] * (1.0 - u) + x[1:, None] * u).ravel()
+    cy = (y[:-1, None] * (1.0 - u) + y[1:, None] * u).ravel()
+    cx = np.append(cx, x[-1])
+    cy = np.append(cy, y[-1])
+
+    r = np.hypot(cx, cy)
+    keep = r >= rb
+    r = r[keep]
+    phi = np.arctan2(cy[keep], cx[keep])
+
+    ideal = involute_polar_angle(rb, r) - involute_polar_angle(rb, rp)
+    excess = rb * (ideal - phi)
+
+    order = np.argsort(r)
+    table = (r[order], excess[order])
+    _flanks[key] = table
+    return table
+
+
+def transmission_error(spec1, spec2, center_distance=None, samples=256):
+    """
+    computes the kinematic transmission error of two make_gear specs over one mesh cycle.
+
+    gear 1 turns through one base pitch; at each step every tooth pair on the path of
+    contact is checked and the pair with the most excess material drives gear 2.
+    returns (theta, error) where theta is the angle of gear 1 and error is the angle
+    gear 2 leads (positive) or lags its ideal position. error is nan where no pair is
+    in contact.
+    """
+    diameter, pressure_angle, teeth1, pitch = spec1
+    _, _, teeth2, _ = spec2
+    _check_specs(spec1, spec2)
+
+    rp1, rb1, ra1 = (float(r) for r in mesh_radii(pressure_angle, teeth1, pitch))
+    rp2, rb2, ra2 = (float(r) for r in mesh_radii(pressure_angle, teeth2, pitch))
+    if center_distance is None:
+        a = rp1 + rp2
+    else:
+        a = center_distance / float(diameter)
+    alpha_w = math.acos(min(1.0, (rp1 + rp2) * math.cos(math.radians(pressure_angle)) / a))
+    tangent = a * math.sin(alpha_w)
+
+    start = tangent - math.sqrt(ra2**2 - rb2**2)
+    end = math.sqrt(ra1**2 - rb1**2)
+    base_pitch = 2.0 * math.pi * rb1 / teeth1
+
+    theta = np.linspace(0.0, 2.0 * math.pi / teeth1, samples, endpoint=False)
+    pairs = np.arange(int(math.ceil((end - start) / base_pitch)) + 1)
+    g1 = start + rb1 * theta[:, None] + pairs * base_pitch
+    contact = (g1 >= start) & (g1 <= end)
+    g2 = tangent - g1
+
+    r1 = np.sqrt(rb1**2 + g1**2)
+    r2 = np.sqrt(rb2**2 + g2**2)
+    excess = (np.interp(r1, *flank_deviation(pressure_angle, teeth1, pitch)) +
+              np.interp(r2, *flank_deviation(pressure_angle, teeth2, pitch)))
+    excess = np.where(contact, excess, -np.inf)
+
+    lead = excess.max(axis=1)
+    error = np.where(np.isfinite(lead), lead / rb2, np.nan)
+    return theta, error
+
+
+def analyze_mesh(spec1, spec2, center_distance=None, samples=256):
+    """
+    runs every mesh check on two make_gear specs, returning a dict of scalars and
+    arrays with lengths scaled by the spec diameter.
+    """
+    diameter, pressure_angle, teeth1, pitch = spec1
+    _, _, teeth2, _ = spec2
+    _check_specs(spec1, spec2)
+
+    a = None if center_distance is None else center_distance / float(diameter)
+    result = dict((k, v.item()) for k, v in
+                  mesh_metrics(pressure_angle, teeth1, teeth2, pitch, a).items())
+    for k in ('center_distance', 'line_of_action', 'base_pitch', 'backlash'):
+        result[k] *= diameter
+
+    sliding = mesh_sliding(pressure_angle, teeth1, teeth2, pitch, a)
+    result['position'] = sliding['position'] * diameter
+    result['sliding_velocity'] = sliding['sliding_velocity'] * diameter
+    result['specific_sliding1'] = sliding['specific_sliding1']
+    result['specific_sliding2'] = sliding['specific_sliding2']
+
+    theta, error = transmission_error(spec1, spec2, center_distance, samples)
+    result['theta'] = theta
+    result['transmission_error'] = error
+    result['transmission_error_pp'] = float(np.nanmax(error) - np.nanmin(error))
+    return result
+
+
+def _check_specs(spec1, spec2):
+    """make_gear specs only mesh if they share diameter scale, pressure angle and pitch"""
+    if (spec1[0], spec1[1], spec1[3]) != (spec2[0], spec2[1], spec2[3]):
+        raise ValueError("gears must share diameter, pressure angle and pitch to mesh")
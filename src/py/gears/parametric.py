@@ -0,0 +1,288 @@
+# Parametric gears that regenerate only what an edit changes.
+#
+# A model is a set of named inputs and stages. Each stage is a function of named
+# inputs or other stages; its value is computed on first use and kept until one of
+# the names it depends on changes. set() drops the stages downstream of the inputs
+# it changes, and nothing else:
+#
+#     gear = GearModel(diameter=1, pressure_angle=20, teeth=40, pitch=8, kerf=0.008,
+#                      basename='out/wheel', formats=('svg', 'dxf'))
+#     gear['files']                   # generates everything and writes the files
+#     gear.set(diameter=2)            # keeps the tooth and the unit outline
+#     gear['files']                   # scales, offsets and writes again
+#
+# The stages of a gear, with what they depend on:
+#
+#     tooth          pressure_angle teeth shift backlash steps root_steps
+#     diameters      tooth diameter pressure_angle teeth pitch
+#     unit_outline   tooth teeth         (replicated at unit pitch)
+#     outline        unit_outline diameter pitch
+#     offsets        unit_outline        (offset_directions)
+#     cut_outline    outline offsets kerf (moved out by half the kerf)
+#     files          cut_outline basename formats scale
+#
+# Teeth are unit pitch and unit diameter until the outline stage, and the offset
+# directions do not change with scale, so changing the diameter, the pitch or the
+# kerf only scales the cached outline and adds the cached offsets. An Assembly keeps
+# many models and updates the ones that are out of date; teeth are also shared
+# between models through the tooth.tooth_polar cache.
+
+import collections
+
+import numpy as np
+
+from . import instrument
+from .gx import gears_base_diameter, gears_pitch_diameter
+from .tooth import replicate, tooth_polar
+
+
+Stage = collections.namedtuple('Stage', 'function inputs')
+
+# stands in for a stage that is not cached, stages may well compute None
+_missing = object()
+
+
+class Model(object):
+    """
+    named inputs and the stages derived from them. model[name] returns an input or a
+    stage, computing the stage and whatever it needs first if they are out of date.
+    computed counts how often every stage was computed.
+    """
+
+    def __init__(self, stages, **inputs):
+        self.stages = dict(stages)
+        self.computed = collections.Counter()
+        self._values = {}
+        self._dependents = collections.defaultdict(list)
+        for name, stage in self.stages.items():
+            for source in stage.inputs:
+                self._dependents[source].append(name)
+        self.set(**inputs)
+
+    def set(self, **changes):
+        """changes inputs and drops the stages that depend on the ones that changed"""
+        for name, value in changes.items():
+            if name in self.stages:
+                raise ValueError("%s is computed, not an input" % name)
+            if name in self._values and _same(self._values[name], value):
+                continue
+            self._values[name] = value
+            self._invalidate(name)
+
+    def _invalidate(self, name):
+        stack = list(self._dependents[name])
+        while stack:
+            name = stack.pop()
+            # a stage that is not cached has no cached dependents either
+            if self._values.pop(name, _missing) is not _missing:
+                stack.extend(self._dependents[name])
+
+    def __getitem__(self, name):
+        if name in self._values:
+            return self._values[name]
+        if name not in self.stages:
+            raise KeyError("no input or stage %r" % name)
+        stage = self.stages[name]
+        args = [self[source] for source in stage.inputs]
+        t = instrument.start()
+        value = stage.function(*args)
+        instrument.stop('stage_' + name, t)
+        self._values[name] = value
+        self.computed[name] += 1
+        return value
+
+    def __contains__(self, name):
+        return name in self.stages or name in self._values
+
+    def inputs(self):
+        return dict((name, value) for name, value in self._values.items() if name not in self.stages)
+
+    def cached(self, name):
+        """true if name is an input or a stage that is up to date"""
+        return name in self._values
+
+    def depends_on(self, name):
+        """the inputs a stage depends on, directly or through other stages"""
+        found = set()
+        stack = [name]
+        while stack:
+            name = stack.pop()
+            if name in self.stages:
+                stack.extend(self.stages[name].inputs)
+            else:
+                found.add(name)
+        return found
+
+    def affected_by(self, name):
+        """the stages that change when an input changes"""
+        found = set()
+        stack = list(self._dependents[name])
+        while stack:
+            name = stack.pop()
+            if name not in found:
+                found.add(name)
+                stack.extend(self._dependents[name])
+        return found
+
+
+def _same(a, b):
+    """equality of input values, arrays compared element by element"""
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    try:
+        return bool(a == b) and type(a) is type(b)
+    except (TypeError, ValueError):
+        return False
+
+
+def offset_directions(points, miter_limit=2.0):
+    """
+    the (n, 2) moves that take a closed outline out by a distance of one: every vertex
+    goes along the bisector of its two edges, far enough that both edges move by one.
+    corners sharper than the miter limit are cut short. the moves do not change when
+    the outline is scaled, so points + d * offset_directions(points) offsets by d at
+    any size.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    closed = n > 1 and np.array_equal(points[0], points[-1])
+    ring = points[:-1] if closed else points
+    keep = np.any(ring != np.roll(ring, 1, axis=0), axis=1)
+    if keep.sum() < 3:
+        return np.zeros_like(points)
+    unique = ring[keep]
+
+    edge = np.roll(unique, -1, axis=0) - unique
+    edge /= np.hypot(edge[:, 0], edge[:, 1])[:, None]
+    normal = np.column_stack([edge[:, 1], -edge[:, 0]])
+    x, y = unique[:, 0], unique[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0:
+        # clockwise: the right hand side is inside
+        normal = -normal
+    before = np.roll(normal, 1, axis=0)
+    # n1 + n2 over 1 + n1.n2 moves both edges by exactly one
+    move = (before + normal) / np.maximum(1.0 + np.sum(before * normal, axis=1), 1e-12)[:, None]
+    length = np.hypot(move[:, 0], move[:, 1])
+    move *= (np.minimum(length, miter_limit) / np.where(length > 0, length, 1.0))[:, None]
+
+    # repeated points move with the one they repeat, the closing point with the first
+    move = move[np.cumsum(keep) - 1]
+    if closed:
+        move = np.vstack([move, move[:1]])
+    return move
+
+
+def kerf_offset(points, distance, miter_limit=2.0):
+    """
+    moves a closed outline out by distance, in by a negative one (see offset_directions)
+    """
+    points = np.asarray(points, dtype=float)
+    return points + distance * offset_directions(points, miter_limit)
+
+
+def _diameters(tooth, diameter, pressure_angle, teeth, pitch):
+    # the tip and the root move with the profile shift, and a tip may come to a point
+    # short of the addendum, so they are measured on the tooth as generated
+    r, theta = tooth
+    scale = 2.0 * diameter / float(pitch)
+    return {
+        'pitch': diameter * gears_pitch_diameter(teeth, pitch),
+        'base': diameter * gears_base_diameter(pressure_angle, teeth, pitch),
+        'outer': scale * float(r.max()),
+        'root': scale * float(r.min()),
+    }
+
+
+def _unit_outline(tooth, teeth):
+    r, theta = tooth
+    return replicate(r, theta, teeth)
+
+
+def _outline(unit_outline, diameter, pitch):
+    return unit_outline * (diameter / float(pitch))
+
+
+def _cut_outline(outline, offsets, kerf):
+    return outline + (kerf / 2.0) * offsets if kerf else outline
+
+
+def _files(outline, basename, formats, scale):
+    if basename is None:
+        return []
+    from .export_manager import export_all
+    return export_all(outline[:, 0].tolist(), outline[:, 1].tolist(), basename, formats, scale=scale)
+
+
+GEAR_STAGES = {
+    'tooth': Stage(tooth_polar, ('pressure_angle', 'teeth', 'shift', 'backlash', 'steps', 'root_steps')),
+    'diameters': Stage(_diameters, ('tooth', 'diameter', 'pressure_angle', 'teeth', 'pitch')),
+    'unit_outline': Stage(_unit_outline, ('tooth', 'teeth')),
+    'outline': Stage(_outline, ('unit_outline', 'diameter', 'pitch')),
+    'offsets': Stage(offset_directions, ('unit_outline',)),
+    'cut_outline': Stage(_cut_outline, ('outline', 'offsets', 'kerf')),
+    'files': Stage(_files, ('cut_outline', 'basename', 'formats', 'scale')),
+}
+
+GEAR_DEFAULTS = {
+    'diameter': 1.0,
+    'pressure_angle': 20.0,
+    'pitch': 8.0,
+    'shift': 0.0,
+    'backlash': 0.05,
+    'steps': 30,
+    'root_steps': 30,
+    'kerf': 0.0,
+    'basename': None,
+    'formats': ('svg',),
+    'scale': 1.0,
+}
+
+
+class GearModel(Model):
+    """
+    a rack-cut spur gear (tooth.make_gear) as a model; teeth is required, the other
+    inputs default to GEAR_DEFAULTS
+    """
+
+    def __init__(self, **inputs):
+        values = dict(GEAR_DEFAULTS)
+        values.update(inputs)
+        if 'teeth' not in values:
+            raise ValueError("teeth missing")
+        Model.__init__(self, GEAR_STAGES, **values)
+
+
+class Assembly(object):
+    """
+    named models edited together. set() changes inputs of one model, or of all of them
+    without a name; update() brings a stage of every model up to date and returns the
+    names of the models it had to recompute.
+    """
+
+    def __init__(self):
+        self.models = collections.OrderedDict()
+
+    def add(self, name, model):
+        self.models[name] = model
+        return model
+
+    def __getitem__(self, name):
+        return self.models[name]
+
+    def __len__(self):
+        return len(self.models)
+
+    def set(self, name=None, **changes):
+        models = self.models.values() if name is None else [self.models[name]]
+        for model in models:
+            model.set(**changes)
+
+    def stale(self, stage='files'):
+        """names of the models whose stage is out of date"""
+        return [name for name, model in self.models.items() if not model.cached(stage)]
+
+    def update(self, stage='files'):
+        names = self.stale(stage)
+        for name in names:
+            self.models[name][stage]
+        return names
@@ -0,0 +1,430 @@
+# Compound gear-train search.
+#
+# Finds tooth counts for 1-4 stage trains that hit a target overall ratio, with all
+# stages reducing, or all stepping up for targets below 1.
+# Single-stage ratios are tabulated once per (pitch, limits). A train is split into
+# two halves of one or two stages, and each left half finds its matching right
+# halves with a binary search. Stage pairs are only built for the log ratio window
+# and the size bound a query can still use, never for the whole table. Trains are
+# searched smallest first, in passes of growing size, so once the k best are exact
+# the larger ones are never looked at; the best trains found so far narrow the
+# window for the rest of the search. Left halves are taken a block of log ratios at
+# a time, which bounds the memory of the passes that take every size.
+
+import collections
+import heapq
+import math
+
+import numpy as np
+
+from .gx import gears_outer_diameter, gears_pitch_diameter, make_gear
+
+
+Train = collections.namedtuple('Train', 'stages ratio error size pitch')
+
+# trains are searched in passes of sizes growing by this factor, the last pass
+# taking every size
+SIZE_STEP = 1.1
+SIZE_PASSES = 8
+
+_tables = {}
+
+
+def stage_table(pitch, min_teeth=10, max_teeth=100, max_outer_diameter=None, max_stage_ratio=6.0):
+    """
+    tabulate the distinct single-stage reductions (driven/driver > 1) for a given pitch.
+
+    returns (driver, driven, log_ratio, size) arrays sorted by log_ratio, where size is
+    the sum of both outer diameters. of all pairs giving the same ratio only the
+    smallest is kept.
+    """
+    key = (float(pitch), min_teeth, max_teeth, max_outer_diameter, max_stage_ratio)
+    if key in _tables:
+        return _tables[key]
+
+    teeth = np.arange(min_teeth, max_teeth+1)
+    outer = np.array([gears_outer_diameter(z, pitch) for z in teeth])
+    if max_outer_diameter is not None:
+        keep = outer <= max_outer_diameter
+        teeth = teeth[keep]
+        outer = outer[keep]
+
+    driver, driven = np.meshgrid(teeth, teeth, indexing='ij')
+    odriver, odriven = np.meshgrid(outer, outer, indexing='ij')
+    driver = driver.ravel()
+    driven = driven.ravel()
+    size = (odriver + odriven).ravel()
+
+    keep = (driven > driver) & (driven <= max_stage_ratio * driver)
+    driver = driver[keep]
+    driven = driven[keep]
+    size = size[keep]
+
+    # one row per reduced fraction, smallest pair first
+    g = np.gcd(driver, driven)
+    num = driven // g
+    den = driver // g
+    order = np.lexsort((size, den, num))
+    num = num[order]
+    den = den[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (num[1:] != num[:-1]) | (den[1:] != den[:-1])
+    order = order[first]
+
+    driver = driver[order]
+    driven = driven[order]
+    size = size[order]
+    log_ratio = np.log(driven / driver.astype(float))
+
+    order = np.argsort(log_ratio, kind='stable')
+    table = (driver[order], driven[order], log_ratio[order], size[order])
+    for a in table:
+        a.setflags(write=False)
+
+    _tables[key] = table
+    return table
+
+
+def search_trains(target, pitch, tolerance=0.01, max_stages=4, k=10, min_teeth=10,
+                  max_teeth=100, max_outer_diameter=None, max_stage_ratio=6.0, resolution=1e-6):
+    """
+    returns the k best trains of 1 to max_stages stages whose overall ratio (the
+    product of driven/driver over all stages) is within the relative tolerance of
+    target, ranked by error and then by total size. errors below resolution count
+    as exact, so among those the smallest trains win.
+
+    targets below 1 are searched as step-ups: every stage is returned as (driver, driven)
+    with the larger gear driving.
+
+    every stage of a train turns the same way, all reductions or all step-ups, and no
+    stage is 1:1, as the search bounds rely on every stage adding to the log ratio.
+    trains that mix reductions and step-ups are never found, so a target of 1 finds
+    nothing (search_trains(1.0, 12) returns []) and targets near 1 only find the
+    stages closest to 1:1, like 100:99, if they are within the tolerance.
+
+    with the default limits (10-100 teeth, 2535 distinct stages) a cold 4-stage query
+    at a tolerance of 1e-3 or 1e-2, table included, takes 50-350 ms and 5-30 MB, and
+    as the table is cached a warm one 30-250 ms. queries whose k best trains are not
+    all exact (resolution=0) search every size and can take up to 2 s, still within
+    some 50 MB
+    """
+    if target <= 0:
+        raise ValueError("target ratio must be positive")
+
+    step_up = target < 1.0
+    log_target = abs(math.log(target))
+
+    table = stage_table(pitch, min_teeth, max_teeth, max_outer_diameter, max_stage_ratio)
+    driver, driven, log_ratio, size = table
+    if not len(log_ratio):
+        return []
+    search = _Search(table, log_target, tolerance, resolution, k)
+
+    smallest = [search.min_train(stages) for stages in range(1, max_stages+1)]
+    if min(smallest) < np.inf:
+        # smallest trains first: once the k best are exact, larger trains cannot win
+        lower, upper = 0.0, SIZE_STEP * min(smallest)
+        for passes in range(1, SIZE_PASSES + 1):
+            if passes == SIZE_PASSES or upper >= max_stages * size.max():
+                upper = np.inf
+            search.lower, search.upper = lower, upper
+            for stages in range(1, max_stages+1):
+                if smallest[stages-1] < upper:
+                    search.run(stages)
+            if upper == np.inf or search.max_size() is not None:
+                break
+            lower, upper = upper, SIZE_STEP * upper
+
+    trains = []
+    for _, _, _, chosen, err, total in sorted(search.heap, reverse=True):
+        stages = tuple((int(driver[i]), int(driven[i])) for i in chosen)
+        if step_up:
+            stages = tuple((b, a) for a, b in stages)
+        ratio = 1.0
+        for a, b in stages:
+            ratio *= float(b) / a
+        trains.append(Train(stages, ratio, err, float(total), pitch))
+    return trains
+
+
+class _Search(object):
+    """
+    meet-in-the-middle search over combinations of table stages.
+
+    an n-stage train is split into a left part of n//2 stages and a right part of the
+    rest, single stages or stage pairs built for the window at hand and sorted by log
+    ratio. every left part looks up the right parts that complete it with a binary
+    search. stage indices never decrease along a train, so each train is seen once.
+    parts that cannot make a train below the size limit are left out, only trains of
+    a size in [lower, upper) are offered, and the k best trains so far narrow the
+    search window as they come in.
+    """
+
+    chunk = 50000
+    block = 200000
+    size_bands = 8
+
+    def __init__(self, table, log_target, tolerance, resolution, k):
+        _, _, log_ratio, size = table
+        self.log_ratio = log_ratio
+        self.size = size
+        self.smallest = size.min()
+        self.step, self.least = _least_sizes(log_ratio, size)
+        # the table split by size, every band in log ratio order
+        order = np.argsort(size, kind='stable')
+        self.bands = [np.sort(band) for band in np.array_split(order, min(self.size_bands, len(order)))]
+        self.log_target = log_target
+        self.tolerance = tolerance
+        self.resolution = resolution
+        self.ltol = -math.log(1.0 - min(tolerance, 0.5))
+        self.k = k
+        self.heap = []
+        self.count = 0
+        self.lower = 0.0
+        self.upper = np.inf
+
+    def max_size(self):
+        """the size any new train must stay below, or None while errors still decide"""
+        if len(self.heap) == self.k and self.heap[0][0] == 0.0:
+            return -self.heap[0][1]
+        return None
+
+    def limit(self):
+        """the size any train offered now must stay below"""
+        limit = self.max_size()
+        return self.upper if limit is None else min(limit, self.upper)
+
+    def min_size(self, stages, log_ratio):
+        """a lower bound on the size of a part of 0, 1 or 2 stages of at least log_ratio"""
+        if not stages:
+            return np.where(np.asarray(log_ratio) <= 0.0, 0.0, np.inf)
+        least = self.least[stages-1]
+        return least[np.clip(np.asarray(log_ratio) / self.step, 0, len(least) - 1).astype(int)]
+
+    def min_train(self, stages):
+        """a lower bound on the size of any train of 1 to 4 stages within tolerance"""
+        rest = self.log_target - self.ltol
+        if stages <= 2:
+            return float(self.min_size(stages, rest))
+        # a part of one or two stages in every grid cell, the rest of the ratio in a pair
+        least = self.least[stages-3]
+        return float(np.min(least + self.min_size(2, rest - self.step * np.arange(1, len(least) + 1))))
+
+    def max_log(self, stages, size):
+        """an upper bound on the log ratio of a part of 1 or 2 stages below size"""
+        return self.step * np.searchsorted(self.least[stages-1], size, 'left')
+
+    def part(self, stages, lo, hi, limit, other, left):
+        """
+        the left (smaller) or right parts of 1 or 2 stages with a log ratio in [lo, hi)
+        that a part of other stages can complete to a train below limit, as (log_ratio,
+        size, indices) sorted by log ratio
+        """
+        rest = self.log_target - self.ltol
+        if stages == 1:
+            start = np.searchsorted(self.log_ratio, lo, 'left')
+            end = np.searchsorted(self.log_ratio, hi, 'left')
+            index = np.arange(start, end, dtype=np.int32)
+            part = (self.log_ratio[start:end], self.size[start:end], index[:, None])
+            keep = part[1] + self.min_size(other, rest - part[0]) < limit
+        else:
+            # pairs are found with some slack for rounding, their sums decide
+            part = self.pairs(lo, hi, limit, other, left)
+            keep = (part[0] >= lo) & (part[0] < hi) & (part[1] + self.min_size(other, rest - part[0]) < limit)
+        keep = np.flatnonzero(keep)
+        if stages == 2:
+            keep = keep[np.argsort(part[0][keep])]
+        return tuple(a[keep] for a in part)
+
+    def pairs(self, lo, hi, limit, other, left, count=False):
+        """
+        the non-decreasing pairs of table stages with a log ratio about [lo, hi), leaving
+        out most of those that no part of other stages can complete below limit,
+        unsorted; with count only how many there are
+        """
+        log_ratio, size = self.log_ratio, self.size
+        rest = self.log_target - self.ltol
+        room = limit - self.min_size(other, 0.0)
+        first = np.flatnonzero(size < room - self.smallest)
+        lfirst = log_ratio[first]
+        most = hi - lfirst + 1e-12
+        least = lo - lfirst - 1e-12
+        if left:
+            # the other stages are no smaller than the second stage of a left pair
+            most = np.minimum(most, (self.log_target + self.ltol - lfirst) / (other + 1) + 1e-12)
+        else:
+            # nor larger than the first stage of a right pair
+            least = np.maximum(least, rest - (other + 1) * lfirst - 1e-12)
+        pairs = []
+        found = 0
+        for band in self.bands:
+            second = band[size[band] < room - size[first].min()] if len(first) else band[:0]
+            if not len(second):
+                continue
+            # the larger the first stage, the smaller the part that completes the pair,
+            # so the larger the second stage's log ratio has to be
+            lsecond = log_ratio[second]
+            above = np.maximum(least, rest - lfirst - self.max_log(other, limit - size[first] - size[second].min()))
+            start = np.maximum(np.searchsorted(lsecond, above, 'left'), np.searchsorted(second, first, 'left'))
+            counts = np.maximum(np.searchsorted(lsecond, most, 'right') - start, 0)
+            total = counts.sum()
+            found += total
+            if count:
+                continue
+            offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            pairs.append(np.column_stack([np.repeat(first, counts), second[np.repeat(start, counts) + offset]]))
+        if count:
+            return found
+        pairs = np.concatenate(pairs).astype(np.int32) if pairs else np.zeros((0, 2), np.int32)
+        i, j = pairs[:, 0], pairs[:, 1]
+        return log_ratio[i] + log_ratio[j], size[i] + size[j], pairs
+
+    def run(self, stages):
+        """search all trains of the given number of stages"""
+        target, ltol = self.log_target, self.ltol
+        if stages == 1:
+            singles = self.part(1, target - ltol, target + ltol, self.limit(), 0, False)
+            self.complete(_empty_combinations(), singles)
+            return
+
+        nleft = stages // 2
+        nright = stages - nleft
+        vmax = self.log_ratio[-1]
+
+        # the left part holds the smallest stages, so its mean is at most the train's,
+        # and the right part's at least
+        lo = target - ltol - nright * vmax
+        hi = (target + ltol) * nleft / stages
+        found = self.pairs(lo, hi, self.limit(), nright, True, count=True) if nleft == 2 else 0
+
+        # a block of left log ratios at a time, with the right parts of its window only,
+        # so that parts are never built for the whole table at once
+        edges = np.linspace(lo, hi, found // self.block + 2)
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            left = self.part(nleft, lo, hi, self.limit(), nright, True)
+            if not len(left[0]):
+                continue
+            ltol = self.ltol
+            right = self.part(nright, max(target - ltol - left[0][-1], (target - ltol) * nright / stages),
+                              target + ltol - left[0][0], self.limit(), nleft, False)
+            if len(right[0]):
+                self.complete(left, right)
+
+    def window(self, log_ratio, partial):
+        """index ranges of log_ratio that complete a train from each partial log ratio"""
+        # binary searches run fastest on ascending keys, and partial usually ascends
+        lo = np.searchsorted(log_ratio, (self.log_target - self.ltol - partial)[::-1], 'left')[::-1]
+        hi = np.searchsorted(log_ratio, (self.log_target + self.ltol - partial)[::-1], 'right')[::-1]
+        return lo, hi
+
+    def complete(self, left, right):
+        """offer every train made of a left part and a matching right part"""
+        if not len(right[0]):
+            return
+        left = _smaller(left, self.limit() - right[1].min())
+        llog, lsize, lcols = left
+        rlog, rsize, rcols = right
+
+        rlo, rhi = self.window(rlog, llog)
+        counts = np.maximum(rhi - rlo, 0)
+        total = counts.sum()
+        if not total:
+            return
+        if total > self.chunk and len(llog) > 1:
+            # split the work so that the best trains of one half narrow the other
+            half = np.searchsorted(np.cumsum(counts), total // 2)
+            half = min(max(half, 1), len(llog) - 1)
+            self.complete(tuple(a[:half] for a in left), right)
+            self.complete(tuple(a[half:] for a in left), right)
+            return
+
+        a = np.repeat(np.arange(len(llog)), counts)
+        b = np.repeat(rlo, counts) + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        if lcols.shape[1]:
+            keep = lcols[a, -1] <= rcols[b, 0]
+            a, b = a[keep], b[keep]
+
+        self.offer(np.concatenate([lcols[a], rcols[b]], axis=1),
+                   llog[a] + rlog[b], lsize[a] + rsize[b])
+
+    def offer(self, cols, log_total, total):
+        """push candidate trains best first"""
+        err = np.abs(np.expm1(log_total - self.log_target))
+        # errors that differ only by rounding rank as equal
+        rank = np.where(err <= self.resolution, 0.0, np.round(err, 12))
+        ok = (err <= self.tolerance) & (total >= self.lower) & (total < self.upper)
+        limit = self.max_size()
+        if limit is not None:
+            ok &= (rank == 0.0) & (total < limit)
+        if not ok.any():
+            return
+
+        err, rank, total, cols = err[ok], rank[ok], total[ok], cols[ok]
+        if len(err) > self.k:
+            best = np.lexsort((total, rank))[:self.k]
+        else:
+            best = np.lexsort((total, rank))
+        for i in best:
+            chosen = tuple(int(c) for c in cols[i])
+            if not self.push(chosen, float(rank[i]), float(err[i]), float(total[i])):
+                break
+
+    def push(self, chosen, rank, err, total):
+        """keep the k best (error, size) trains, returns False if the train missed the cut"""
+        heap = self.heap
+        self.count += 1
+        item = (-rank, -total, -self.count, chosen, err, total)
+        if len(heap) < self.k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+        else:
+            return False
+
+        if len(heap) == self.k:
+            worst = max(-heap[0][0], self.resolution)
+            self.tolerance = min(self.tolerance, worst)
+            self.ltol = min(self.ltol, -math.log(1.0 - min(worst, 0.5)))
+        return True
+
+
+def _least_sizes(log_ratio, size, steps=512):
+    """
+    lower bounds on the size of a single stage and of a stage pair whose log ratio is
+    at least x, for x on a grid of steps points up to twice the largest log ratio, as
+    (step, sizes) with sizes (2, steps + 1) and nothing reaching beyond the grid
+    """
+    step = 2.0 * log_ratio[-1] / (steps - 1) if len(log_ratio) else 1.0
+    suffix = np.append(np.minimum.accumulate(size[::-1])[::-1], np.inf)
+    sizes = np.full((2, steps + 1), np.inf)
+    sizes[0, :steps] = suffix[np.searchsorted(log_ratio, step * np.arange(steps), 'left')]
+    # a pair with its first stage in cell h of the grid needs a second from cell g-h-1
+    cell = np.arange(steps)
+    sizes[1, :steps] = (sizes[0, :steps] + sizes[0, np.maximum(cell[:, None] - cell - 1, 0)]).min(axis=1)
+    return step, sizes
+
+
+def _smaller(combo, size):
+    """the part of a combination table below a given size"""
+    keep = combo[1] < size
+    return tuple(a[keep] for a in combo)
+
+
+def _empty_combinations():
+    """the empty left part of a single-stage train"""
+    return (np.zeros(1), np.zeros(1), np.zeros((1, 0), dtype=np.int32))
+
+
+def train_center_distances(train):
+    """returns the center distance of every stage of a train"""
+    return [(gears_pitch_diameter(a, train.pitch) + gears_pitch_diameter(b, train.pitch)) / 2.0
+            for a, b in train.stages]
+
+
+def make_train(train, diameter, pressure_angle):
+    """
+    generates the gear outlines of a train as a list of (driver, driven) point lists
+    """
+    return [(list(make_gear(diameter, pressure_angle, a, train.pitch)),
+             list(make_gear(diameter, pressure_angle, b, train.pitch)))
+            for a, b in train.stages]
@@ -0,0 +1,163 @@
+# Binary STL of an extruded outline.
+#
+# A 2d outline, a gear or a disc, becomes a plate of the given thickness: a wall of
+# two triangles per segment and a bottom and top cap. Caps of outlines that are
+# star-shaped around their center, like gears without undercut, are fans from the
+# center. Others are triangulated by ear clipping, many ears at a time: every round
+# takes every other vertex that is an ear, so a few dozen vectorized rounds cover
+# thousands of points. Ears that do not touch each other can be cut together without
+# one spoiling the other.
+#
+# http://www.fabbers.com/tech/STL_Format
+
+import numpy as np
+
+
+STL_TRIANGLE = np.dtype([('normal', '<f4', 3), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+
+def _cross(ax, ay, bx, by, cx, cy):
+    """twice the signed area of the triangles a, b, c"""
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _alternate(ear):
+    """every other vertex of every run of consecutive ears, never both ends of the ring"""
+    index = np.arange(len(ear))
+    start = np.maximum.accumulate(np.where(ear, -1, index))
+    take = ear & ((index - start) % 2 == 1)
+    if take[0] and take[-1]:
+        take[-1] = False
+    return take
+
+
+def triangulate(x, y):
+    """
+    triangles of a simple counterclockwise polygon as an (n - 2, 3) array of vertex
+    indices. raises ValueError when no ear is left, which only happens to polygons
+    that cross themselves
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ring = np.arange(len(x))
+    triangles = []
+    while len(ring) > 3:
+        a = np.roll(ring, 1)
+        c = np.roll(ring, -1)
+        turn = _cross(x[a], y[a], x[ring], y[ring], x[c], y[c])
+        reflex = ring[turn <= 0]
+        candidates = np.flatnonzero(turn > 0)
+
+        # a convex vertex is an ear when no reflex vertex but its neighbours is in or on
+        # its triangle. only the reflex vertices within the x range of a triangle are
+        # tested, as (triangle, vertex) pairs found by bisection in x order
+        ear = np.zeros(len(ring), bool)
+        ta, tb, tc = a[candidates], ring[candidates], c[candidates]
+        order = reflex[np.argsort(x[reflex])]
+        rx = x[order]
+        lo = np.searchsorted(rx, np.minimum(np.minimum(x[ta], x[tb]), x[tc]), 'left')
+        hi = np.searchsorted(rx, np.maximum(np.maximum(x[ta], x[tb]), x[tc]), 'right')
+        pair = np.repeat(np.arange(len(candidates)), hi - lo)
+        r = order[np.arange(len(pair)) - np.repeat(np.cumsum(hi - lo) - (hi - lo) - lo, hi - lo)]
+        pa, pb, pc = ta[pair], tb[pair], tc[pair]
+        inside = ((_cross(x[pa], y[pa], x[pb], y[pb], x[r], y[r]) >= 0)
+                  & (_cross(x[pb], y[pb], x[pc], y[pc], x[r], y[r]) >= 0)
+                  & (_cross(x[pc], y[pc], x[pa], y[pa], x[r], y[r]) >= 0)
+                  & (r != pa) & (r != pc))
+        ear[candidates] = np.bincount(pair[inside], minlength=len(candidates)) == 0
+
+        if not ear.any():
+            # only collinear or reflex vertices: cut a flat one, its triangle is empty
+            flat = np.flatnonzero(turn == 0)
+            if not len(flat):
+                raise ValueError("outline crosses itself")
+            ear[flat[0]] = True
+        take = _alternate(ear)
+        triangles.append(np.column_stack([a[take], ring[take], c[take]]))
+        ring = ring[~take]
+    if len(ring) == 3:
+        # two opposite ears of a quadrilateral leave nothing
+        triangles.append(ring[None, :])
+    return np.concatenate(triangles)
+
+
+def _outline(points):
+    """(n, 2) counterclockwise outline without repeated points or a closing point"""
+    points = np.asarray(points, dtype=float)
+    keep = np.any(points != np.roll(points, 1, axis=0), axis=1)
+    points = points[keep] if keep.any() else points[:1]
+    x, y = points[:, 0], points[:, 1]
+    if np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)) < 0:
+        points = points[::-1]
+    return points
+
+
+def _star_center(points):
+    """
+    the center of the bounding box of a counterclockwise outline if the outline turns
+    strictly counterclockwise around it once, as gears without undercut do, else None
+    """
+    center = (points.min(axis=0) + points.max(axis=0)) / 2.0
+    x, y = (points - center).T
+    xn, yn = np.roll(x, -1), np.roll(y, -1)
+    turn = _cross(0.0, 0.0, x, y, xn, yn)
+    if not np.all(turn > 0):
+        return None
+    # every step turns left; once round means the steps add up to a full turn
+    if abs(np.sum(np.arctan2(turn, x * xn + y * yn)) - 2.0 * np.pi) > 1e-6:
+        return None
+    return center
+
+
+def extrude(points, thickness=1.0):
+    """
+    the triangles of an outline extruded from z=0 to thickness, as an STL_TRIANGLE
+    array with outward normals
+    """
+    points = _outline(points)
+    n = len(points)
+    if n < 3:
+        raise ValueError("an outline needs 3 distinct points, got %d" % n)
+    bottom = np.column_stack([points, np.zeros(n)])
+    top = np.column_stack([points, np.full(n, float(thickness))])
+
+    i = np.arange(n)
+    j = np.roll(i, -1)
+    center = _star_center(points)
+    if center is not None:
+        # a fan from the center, for outlines that every ray from it crosses once
+        low = np.broadcast_to(np.append(center, 0.0), (n, 3))
+        high = np.broadcast_to(np.append(center, float(thickness)), (n, 3))
+        bottom_cap = np.stack([low, bottom[j], bottom[i]], axis=1)
+        top_cap = np.stack([high, top[i], top[j]], axis=1)
+    else:
+        caps = triangulate(points[:, 0], points[:, 1])
+        bottom_cap = bottom[caps[:, ::-1]]
+        top_cap = top[caps]
+    vertices = np.concatenate([
+        bottom_cap,
+        top_cap,
+        np.stack([bottom[i], bottom[j], top[j]], axis=1),
+        np.stack([bottom[i], top[j], top[i]], axis=1)])
+
+    normals = np.cross(vertices[:, 1] - vertices[:, 0], vertices[:, 2] - vertices[:, 0])
+    length = np.linalg.norm(normals, axis=1)
+    normals /= np.where(length > 0, length, 1.0)[:, None]
+
+    triangles = np.zeros(len(vertices), STL_TRIANGLE)
+    triangles['normal'] = normals
+    triangles['vertices'] = vertices
+    return triangles
+
+
+def stl_bytes(triangles, name='gears.py'):
+    """a binary STL file of an STL_TRIANGLE array"""
+    header = name.encode('ascii', 'replace')[:80].ljust(80, b' ')
+    return header + np.uint32(len(triangles)).tobytes() + triangles.tobytes()
+
+
+def export_stl(px, py, filename, scale=1.0, thickness=1.0):
+    """writes an outline extruded to thickness (after scaling) as a binary STL file"""
+    points = scale * np.column_stack([px, py])
+    with open(filename, 'wb') as out:
+        out.write(stl_bytes(extrude(points, thickness), filename))
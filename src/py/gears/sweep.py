@@ -0,0 +1,170 @@
+# Design-space sweeps over gx parameters.
+#
+# Every (pressure_angle, teeth, pitch, backlash, steps) combination of a sweep is
+# generated once with make_gear and its derived dimensions are stored column by
+# column in an .npz file. Re-running a sweep only generates the combinations the
+# store does not hold yet, and queries are answered from the stored columns.
+
+import itertools
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from .gx import (gears_base_diameter, gears_circular_tooth_thickness, gears_outer_diameter,
+                 gears_pitch_diameter, gears_root_diameter, make_gear)
+
+
+PARAMETERS = ('pressure_angle', 'teeth', 'pitch', 'backlash', 'steps')
+METRICS = ('pitch_diameter', 'base_diameter', 'outer_diameter', 'root_diameter',
+           'tooth_thickness', 'undercut', 'vertices', 'seconds')
+
+_dtypes = {
+    'teeth': np.int32,
+    'steps': np.int32,
+    'undercut': bool,
+    'vertices': np.int32,
+}
+
+
+def gear_metrics(params, diameter=1.0):
+    """
+    generates one gear and returns its metrics, in METRICS order, with lengths scaled
+    by diameter like make_gear
+    """
+    pressure_angle, teeth, pitch, backlash, steps = params
+
+    start = time.time()
+    vertices = len(list(make_gear(diameter, pressure_angle, teeth, pitch, backlash, steps)))
+    seconds = time.time() - start
+
+    # a full-depth tooth is undercut by the generating rack below 2/sin^2 teeth
+    undercut = teeth < 2.0 / math.sin(math.radians(pressure_angle))**2
+
+    return (
+        diameter * gears_pitch_diameter(teeth, pitch),
+        diameter * gears_base_diameter(pressure_angle, teeth, pitch),
+        diameter * gears_outer_diameter(teeth, pitch),
+        diameter * gears_root_diameter(teeth, pitch),
+        diameter * gears_circular_tooth_thickness(pitch, backlash),
+        undercut,
+        vertices,
+        seconds,
+    )
+
+
+def _gear_metrics(args):
+    """pool entry point for gear_metrics"""
+    return gear_metrics(*args)
+
+
+def run_sweep(path, pressure_angles, teeth, pitches, backlashes=(0.05,), steps=(30,),
+              diameter=1.0, processes=None):
+    """
+    generates every combination of the given parameter lists that path does not hold
+    yet, in parallel, and saves the grown store back to path. returns the store.
+
+    processes=1 generates in this process.
+    """
+    store = load_sweep(path) if os.path.exists(path) else empty_sweep(diameter)
+    if store['diameter'] != diameter:
+        raise ValueError("%s was swept at diameter %s" % (path, store['diameter']))
+
+    index = sweep_index(store)
+    todo = [params for params in itertools.product(pressure_angles, teeth, pitches, backlashes, steps)
+            if _key(params) not in index]
+    if not todo:
+        return store
+
+    if processes == 1:
+        rows = [gear_metrics(params, diameter) for params in todo]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            chunksize = max(1, len(todo) // (4 * (processes or multiprocessing.cpu_count())))
+            rows = pool.map(_gear_metrics, [(params, diameter) for params in todo], chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+    added = {}
+    for name, column in zip(PARAMETERS + METRICS, zip(*[p + r for p, r in zip(todo, rows)])):
+        added[name] = np.array(column, dtype=_dtypes.get(name, float))
+    for name in PARAMETERS + METRICS:
+        store[name] = np.concatenate([store[name], added[name]])
+    store.pop('index', None)
+
+    save_sweep(path, store)
+    return store
+
+
+def empty_sweep(diameter=1.0):
+    """returns a store without rows"""
+    store = dict((name, np.zeros(0, dtype=_dtypes.get(name, float))) for name in PARAMETERS + METRICS)
+    store['diameter'] = float(diameter)
+    return store
+
+
+def save_sweep(path, store):
+    """writes the columns of a store to an .npz file, replacing it in one step"""
+    tmp = path + '.tmp.npz'
+    columns = dict((name, store[name]) for name in PARAMETERS + METRICS)
+    np.savez(tmp, diameter=store['diameter'], **columns)
+    os.replace(tmp, path)
+
+
+def load_sweep(path):
+    """reads a store written by save_sweep"""
+    data = np.load(path)
+    store = dict((name, data[name]) for name in PARAMETERS + METRICS)
+    store['diameter'] = float(data['diameter'])
+    return store
+
+
+def _key(params):
+    """index key of a parameter tuple"""
+    pressure_angle, teeth, pitch, backlash, steps = params
+    return (float(pressure_angle), int(teeth), float(pitch), float(backlash), int(steps))
+
+
+def sweep_index(store):
+    """returns a dict from parameter tuple to row number, built once per store"""
+    if 'index' not in store:
+        rows = zip(*[store[name].tolist() for name in PARAMETERS])
+        store['index'] = dict((_key(params), i) for i, params in enumerate(rows))
+    return store['index']
+
+
+def sweep_lookup(store, pressure_angle, teeth, pitch, backlash=0.05, steps=30):
+    """returns the metrics of one stored gear as a dict, or None if it was never swept"""
+    row = sweep_index(store).get(_key((pressure_angle, teeth, pitch, backlash, steps)))
+    if row is None:
+        return None
+    return dict((name, store[name][row].item()) for name in PARAMETERS + METRICS)
+
+
+def query(store, **criteria):
+    """
+    selects stored rows by column. a criterion is either a value the column must equal
+    or a (low, high) pair with low <= value < high, where either end may be None:
+
+        query(store, pressure_angle=20, outer_diameter=(None, 60), undercut=False)
+
+    returns the matching rows as a dict of columns.
+    """
+    mask = np.ones(len(store['teeth']), dtype=bool)
+    for name, value in criteria.items():
+        if name not in PARAMETERS + METRICS:
+            raise KeyError("unknown sweep column %r" % name)
+        column = store[name]
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column < high
+        else:
+            mask &= column == value
+    return dict((name, store[name][mask]) for name in PARAMETERS + METRICS)
@@ -0,0 +1,82 @@
+import math
+import struct
+
+import numpy as np
+import pytest
+
+from gears import dxf
+from gears.export import export_dxf_outlines
+
+
+SQUARE = [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.0, 0.0)]
+
+# a square of LINEs written out of order, one of them turned, a circle and an arc
+PAIRS = [(0, 'SECTION'), (2, 'HEADER'), (9, '$ACADVER'), (1, 'AC1015'), (0, 'ENDSEC'),
+         (0, 'SECTION'), (2, 'ENTITIES')]
+for i in (2, 0, 3, 1):
+    (x0, y0), (x1, y1) = SQUARE[i], SQUARE[i + 1]
+    if i == 3:
+        (x0, y0), (x1, y1) = (x1, y1), (x0, y0)
+    PAIRS += [(0, 'LINE'), (8, 'cut'), (10, x0), (20, y0), (30, 0.0), (11, x1), (21, y1), (31, 0.0)]
+PAIRS += [(0, 'CIRCLE'), (8, 'holes'), (10, 0.5), (20, 0.5), (40, 0.25),
+          (0, 'ARC'), (8, 'marks'), (10, 2.0), (20, 0.0), (40, 1.0), (50, 0.0), (51, 90.0),
+          (0, 'ENDSEC'), (0, 'EOF')]
+
+
+def write_ascii(filename):
+    with open(filename, 'w') as out:
+        for code, value in PAIRS:
+            out.write('%3d\n%s\n' % (code, value))
+
+
+def write_binary(filename):
+    with open(filename, 'wb') as out:
+        out.write(dxf.BINARY_SENTINEL)
+        for code, value in PAIRS:
+            out.write(struct.pack('<H', code))
+            if isinstance(value, float):
+                out.write(struct.pack('<d', value))
+            else:
+                out.write(value.encode('ascii') + b'\0')
+
+
+@pytest.fixture(params=['ascii', 'binary'])
+def drawing(request, tmp_path):
+    filename = str(tmp_path / 'drawing.dxf')
+    (write_ascii if request.param == 'ascii' else write_binary)(filename)
+    return filename
+
+
+def test_tokens(drawing):
+    tokens = list(dxf.tokens(drawing))
+    assert tokens[:4] == [(0, 'SECTION'), (2, 'HEADER'), (9, '$ACADVER'), (1, 'AC1015')]
+    assert tokens == PAIRS
+
+
+def test_entities(drawing):
+    entities = list(dxf.entities(drawing))
+    assert [(e.kind, e.layer, e.closed) for e in entities] == \
+        [('LINE', 'cut', False)] * 4 + [('CIRCLE', 'holes', True), ('ARC', 'marks', False)]
+    np.testing.assert_allclose(entities[0].points, [[1.0, 1.0], [0.0, 1.0]])
+    np.testing.assert_allclose(entities[5].points[[0, -1]], [[3.0, 0.0], [2.0, 1.0]], atol=1e-12)
+    assert [e.kind for e in dxf.entities(drawing, kinds=('ARC',))] == ['ARC']
+
+
+@pytest.mark.parametrize('block', [7, 100, dxf.BLOCK_SIZE])
+def test_read_dxf(drawing, block, monkeypatch):
+    monkeypatch.setattr(dxf, 'BLOCK_SIZE', block)
+    profiles = dxf.read_dxf(drawing)
+    assert [(p.layer, p.closed, len(p.points)) for p in profiles] == \
+        [('holes', True, 73), ('marks', False, 19), ('cut', True, 5)]
+    np.testing.assert_allclose(profiles[2].points, [SQUARE[2], SQUARE[3], SQUARE[4], SQUARE[1], SQUARE[2]])
+    assert len(dxf.read_dxf(drawing, join=False)) == 6
+
+
+def test_read_exported_outlines(tmp_path):
+    filename = str(tmp_path / 'outlines.dxf')
+    t = np.linspace(0.0, 2.0 * math.pi, 101)
+    circle = (np.cos(t).tolist(), np.sin(t).tolist())
+    export_dxf_outlines([circle, ([3.0, 4.0, 4.0], [0.0, 0.0, 1.0])], filename)
+    profiles = dxf.read_dxf(filename)
+    assert [(p.closed, len(p.points)) for p in profiles] == [(True, 101), (False, 3)]
+    np.testing.assert_allclose(profiles[0].points, np.column_stack(circle), atol=1e-6)
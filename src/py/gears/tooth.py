@@ -0,0 +1,333 @@
+# Rack-generated spur gear teeth over arrays.
+#
+# gx builds a tooth from an involute and a radial line down to the root, which is
+# wrong for small gears: the rack that cuts a real gear undercuts the flank when
+# there are fewer than 2/sin^2(pressure angle) teeth. Here each flank is the
+# outline left by a rack with a rounded tip: an involute from the straight part of
+# the rack flank and a trochoid from the tip round, whichever cuts deeper at each
+# radius. A profile shift (x, in multiples of the module 1/pitch) moves the rack
+# out and removes the undercut.
+#
+# Internal (ring) gears and racks come from the same involute, mirror and replicate
+# steps, and a planetary set is generated in one batch from cached teeth.
+#
+# Teeth are symmetric about the +x axis, and are cached in polar form for unit
+# pitch per (teeth, pressure angle, shift, backlash, steps).
+#
+# https://www.bostongear.com/pdf/gear_theory.pdf
+
+import math
+
+import numpy as np
+
+from . import instrument
+from .gx import gears_circular_pitch, gears_circular_tooth_thickness
+from .involute_table import involute_polar_angle, pointed_tip_radius
+
+
+ADDENDUM = 1.0
+DEDENDUM = 1.25
+
+_teeth = {}
+
+
+def undercut(pressure_angle, teeth, shift=0.0):
+    """true where a rack-cut gear of the given teeth and shift is undercut (arrays allowed)"""
+    s = np.sin(np.radians(pressure_angle))
+    return np.asarray(teeth) * s * s / 2.0 < ADDENDUM - np.asarray(shift)
+
+
+def undercut_shift(pressure_angle, teeth):
+    """smallest profile shift that avoids undercut, 0 for gears that need none"""
+    s = np.sin(np.radians(pressure_angle))
+    return np.maximum(0.0, ADDENDUM - np.asarray(teeth) * s * s / 2.0)
+
+
+def _flank(pressure_angle, teeth, shift, backlash, steps, root_steps):
+    """
+    returns (radius, angle) of the lower flank of a unit-pitch tooth, from the root
+    up to the tip, in a frame where the flank crosses the pitch circle at angle 0
+    and the tooth lies at positive angles
+    """
+    alpha = math.radians(pressure_angle)
+    rp = teeth / 2.0
+    rb = rp * math.cos(alpha)
+    ra = rp + ADDENDUM + shift
+    rf = rp - DEDENDUM + shift
+
+    # half tooth angle at the pitch circle
+    thickness = gears_circular_tooth_thickness(1.0, backlash) + 2.0 * shift * math.tan(alpha)
+    half = thickness / (2.0 * rp)
+    tip = min(ra, float(pointed_tip_radius(rp, thickness, pressure_angle)))
+
+    # the rack: tip line at depth below the rolling line, tip round of radius rho
+    # tangent to the tip line and to the straight flank, which ends at depth ht
+    depth = DEDENDUM - shift
+    rho = (DEDENDUM - ADDENDUM) / (1.0 - math.sin(alpha))
+    hc = depth - rho
+    uc = -hc * math.tan(alpha) - rho / math.cos(alpha)
+    ht = ADDENDUM - shift
+
+    # the straight rack flank generates the involute down to this radius; flank
+    # points deeper than rp*sin^2 would touch past the base circle and only undercut
+    h = min(ht, rp * math.sin(alpha)**2)
+    rlim = math.sqrt((rp - h)**2 + (h / math.tan(alpha))**2)
+    rlim = min(max(rlim, rb, rf), tip)
+    roll = np.linspace(math.sqrt((rlim / rb)**2 - 1.0), math.sqrt((tip / rb)**2 - 1.0), steps + 1)
+    ir = rb * np.sqrt(1.0 + roll * roll)
+    itheta = involute_polar_angle(rb, ir) - involute_polar_angle(rb, rp)
+
+    def involute(r):
+        return np.interp(r, ir, itheta, left=-np.inf, right=-np.inf)
+
+    # the tip round's center rolls with the rack and its offset is the trochoid; b is
+    # the distance of the center past the point where it is closest to the gear
+    a = rp - hc
+    b = np.linspace(0.0, math.sqrt(max(tip * tip - a * a, 0.0)) + rho, 4 * root_steps)
+    tr, ttheta = _trochoid(b, rp, a, hc, uc, rho)
+
+    # resample the part of the trochoid that cuts deeper than the involute
+    active = np.nonzero((ttheta >= involute(tr)) & (tr <= tip))[0]
+    stop = active[-1] + 1 if len(active) else 1
+    b = np.linspace(0.0, b[min(stop, len(b) - 1)], root_steps)
+    tr, ttheta = _trochoid(b, rp, a, hc, uc, rho)
+    keep = tr <= tip
+    tr, ttheta = tr[keep], ttheta[keep]
+
+    # at every radius the deeper cut (larger angle) leaves the flank
+    r = np.concatenate([tr, ir[ir > tr[-1]]])
+    theta = np.maximum(np.interp(r, tr, ttheta, left=-np.inf, right=-np.inf), involute(r))
+
+    # never past the tooth center line
+    return r, np.minimum(theta, half), half
+
+
+def _trochoid(b, rp, a, hc, uc, rho):
+    """
+    returns (radius, angle) of the curve cut by the rack tip round, whose center is
+    at depth hc and offset uc on the rack, as its center moves b past the point
+    closest to the gear center (a from it)
+    """
+    phi = (b - uc) / rp
+    c, s = np.cos(phi), np.sin(phi)
+    cx = a * c + b * s
+    cy = -a * s + b * c
+    dx = hc * s + b * c
+    dy = hc * c - b * s
+    n = np.hypot(dx, dy)
+    tx = cx - rho * dy / n
+    ty = cy + rho * dx / n
+    return np.hypot(tx, ty), np.arctan2(ty, tx)
+
+
+def tooth_polar(pressure_angle, teeth, shift=0.0, backlash=0.05, steps=30, root_steps=30):
+    """
+    returns (radius, angle) arrays of one unit-pitch tooth centered on the +x axis,
+    running from the root of the lower flank over the tip to the root of the upper
+    flank. shift may be 'auto' for the smallest shift that avoids undercut.
+    """
+    if shift == 'auto':
+        shift = float(undercut_shift(pressure_angle, teeth))
+    key = (int(teeth), float(pressure_angle), float(shift), float(backlash), steps, root_steps)
+    if key in _teeth:
+        return _teeth[key]
+
+    t = instrument.start()
+    r, theta, half = _flank(pressure_angle, teeth, shift, backlash, steps, root_steps)
+    instrument.stop('involute', t, len(r))
+
+    t = instrument.start()
+    r, theta = mirror_polar(r, theta - half)
+    instrument.stop('mirroring', t, len(r))
+    for a in (r, theta):
+        a.setflags(write=False)
+
+    _teeth[key] = (r, theta)
+    return r, theta
+
+
+def internal_tooth_polar(pressure_angle, teeth, backlash=0.05, steps=30, tip_radius=None):
+    """
+    returns (radius, angle) arrays of one unit-pitch internal gear tooth centered on the
+    +x axis and pointing at the gear center, running from the root of one flank over
+    the tip to the root of the other.
+
+    the flanks are involutes of the same base circle as an external gear, so a ring
+    tooth has the shape of the space of an external gear. tips that would reach inside
+    the base circle are cut off at it; tip_radius cuts them shorter still.
+    """
+    alpha = math.radians(pressure_angle)
+    rp = teeth / 2.0
+    rb = rp * math.cos(alpha)
+    ri = max(rp - ADDENDUM, rb, tip_radius or 0.0)
+    rf = rp + DEDENDUM
+
+    key = ('internal', int(teeth), float(pressure_angle), float(backlash), steps, ri)
+    if key in _teeth:
+        return _teeth[key]
+
+    # a ring tooth gets thinner toward its tip, the opposite of an external one
+    thickness = gears_circular_tooth_thickness(1.0, backlash)
+    roll = np.linspace(math.sqrt((rf / rb)**2 - 1.0), math.sqrt((ri / rb)**2 - 1.0), steps + 1)
+    r = rb * np.sqrt(1.0 + roll * roll)
+    half = thickness / (2.0 * rp) - involute_polar_angle(rb, rp) + involute_polar_angle(rb, r)
+
+    r, theta = mirror_polar(r, -half)
+    for a in (r, theta):
+        a.setflags(write=False)
+
+    _teeth[key] = (r, theta)
+    return r, theta
+
+
+def mirror_polar(r, theta):
+    """
+    appends the reflection of a flank about the x axis, reversed so that the outline
+    runs on around the tooth
+    """
+    return np.concatenate([r, r[::-1]]), np.concatenate([theta, -theta[::-1]])
+
+
+def replicate(r, theta, teeth, scale=1.0, phase=0.0):
+    """
+    rotates a polar tooth to every tooth position and returns the closed outline as an
+    (n, 2) array. phase may be an array of k starting angles, giving (k, n, 2).
+    """
+    t = instrument.start()
+    phase = np.asarray(phase, dtype=float)[..., None, None]
+    angles = theta + (2.0 * math.pi / teeth) * np.arange(teeth)[:, None] + phase
+    angles = angles.reshape(angles.shape[:-2] + (-1,))
+    angles = np.concatenate([angles, angles[..., :1]], axis=-1)
+    r = np.append(np.tile(r, teeth), r[0]) * scale
+    points = np.stack([r * np.cos(angles), r * np.sin(angles)], axis=-1)
+    instrument.stop('replication', t, points.size // 2)
+    return points
+
+
+def make_tooth(pressure_angle, teeth, pitch, shift=0.0, backlash=0.05, steps=30, root_steps=30):
+    """generates a single tooth profile of a rack-cut spur gear as x and y arrays"""
+    r, theta = tooth_polar(pressure_angle, teeth, shift, backlash, steps, root_steps)
+    return r * np.cos(theta) / pitch, r * np.sin(theta) / pitch
+
+
+def make_gear(diameter, pressure_angle, teeth, pitch, shift=0.0, backlash=0.05, steps=30, root_steps=30):
+    """
+    generates a rack-cut spur gear as an (n, 2) array of closed outline points, scaled
+    by diameter like gx.make_gear
+    """
+    r, theta = tooth_polar(pressure_angle, teeth, shift, backlash, steps, root_steps)
+    return replicate(r, theta, teeth, diameter / float(pitch))
+
+
+def make_internal_gear(diameter, pressure_angle, teeth, pitch, backlash=0.05, steps=30):
+    """
+    generates the toothed inner outline of an internal (ring) gear as an (n, 2) array,
+    scaled by diameter like gx.make_gear. the outer rim is left to the caller.
+    """
+    r, theta = internal_tooth_polar(pressure_angle, teeth, backlash, steps)
+    return replicate(r, theta, teeth, diameter / float(pitch))
+
+
+def make_rack(diameter, pressure_angle, teeth, pitch, backlash=0.05, height=None):
+    """
+    generates a straight rack whose pitch line is the x axis and whose teeth point to
+    +y, as an (n, 2) array scaled by diameter like gx.make_gear. the first tooth is
+    centered on x = 0.
+
+    without height the toothed edge is returned open; with it, the rack is closed
+    into a bar whose back lies height below the pitch line.
+    """
+    alpha = math.radians(pressure_angle)
+    half = gears_circular_tooth_thickness(1.0, backlash) / 2.0
+    slope = math.tan(alpha)
+
+    # one tooth: root, flank up to the tip, tip, flank down to the next root
+    x = np.array([-half - DEDENDUM * slope, -half + ADDENDUM * slope,
+                  half - ADDENDUM * slope, half + DEDENDUM * slope])
+    y = np.array([-DEDENDUM, ADDENDUM, ADDENDUM, -DEDENDUM])
+
+    x = (x + gears_circular_pitch(1.0) * np.arange(teeth)[:, None]).ravel()
+    y = np.tile(y, teeth)
+    points = np.column_stack([x, y]) * (diameter / float(pitch))
+
+    if height is not None:
+        back = [[points[-1, 0], -height], [points[0, 0], -height], points[0]]
+        points = np.concatenate([points, back])
+    return points
+
+
+def ring_tip_radius(pressure_angle, ring, planet):
+    """
+    unit-pitch tip radius of a ring gear whose tips stop where the planet flank ends
+    on the line of action, so that they never touch the planet inside its base circle
+    """
+    alpha = math.radians(pressure_angle)
+    rb = ring / 2.0 * math.cos(alpha)
+    stop = (ring - planet) / 2.0 * math.sin(alpha)
+    return max(ring / 2.0 - ADDENDUM, math.sqrt(rb * rb + stop * stop))
+
+
+def planetary_check(pressure_angle, sun, planet, ring, planets):
+    """
+    raises ValueError if a planetary set cannot be built: the ring must be the sun
+    plus two planets, the planets must be equally spaceable and clear each other, and
+    both meshes need a contact ratio of at least 1 (with ring tips at ring_tip_radius)
+    """
+    if ring != sun + 2 * planet:
+        raise ValueError("ring must have sun + 2 * planet = %d teeth, not %d" % (sun + 2 * planet, ring))
+    if (sun + ring) % planets:
+        raise ValueError("%d planets cannot be equally spaced: sun + ring = %d is not a multiple"
+                         % (planets, sun + ring))
+    if (sun + planet) * math.sin(math.pi / planets) <= planet + 2.0 * ADDENDUM:
+        raise ValueError("%d planets of %d teeth do not fit around the sun" % (planets, planet))
+
+    # lengths of the paths of contact, measured along the lines of action
+    alpha = math.radians(pressure_angle)
+    base_pitch = math.pi * math.cos(alpha)
+
+    def reach(teeth, tip):
+        return math.sqrt(tip * tip - (teeth / 2.0 * math.cos(alpha))**2)
+
+    external = (reach(sun, sun / 2.0 + ADDENDUM) + reach(planet, planet / 2.0 + ADDENDUM)
+                - (sun + planet) / 2.0 * math.sin(alpha))
+    internal = (reach(planet, planet / 2.0 + ADDENDUM) - reach(ring, ring_tip_radius(pressure_angle, ring, planet))
+                + (ring - planet) / 2.0 * math.sin(alpha))
+
+    for name, length in (('sun', external), ('ring', internal)):
+        if length < base_pitch:
+            raise ValueError("%s and planet mesh with a contact ratio of %.2f, below 1"
+                             % (name, length / base_pitch))
+
+
+def make_planetary(diameter, pressure_angle, sun, planet, ring, pitch, planets=3,
+                   backlash=0.05, steps=30, root_steps=30):
+    """
+    generates a meshing planetary set after checking it with planetary_check. returns a
+    dict with 'sun' and 'ring' (n, 2) outlines, 'planets' as a (planets, n, 2) array
+    placed around the sun and 'centers' of the planets.
+    """
+    planetary_check(pressure_angle, sun, planet, ring, planets)
+    scale = diameter / float(pitch)
+
+    # planet k sits at angle beta and turns so that a space faces each sun tooth
+    beta = 2.0 * math.pi * np.arange(planets) / planets
+    offset = (beta * sun / (2.0 * math.pi)) % 1.0
+    phase = beta + math.pi + 2.0 * math.pi * (offset - 0.5) / planet
+    distance = (sun + planet) / 2.0 * scale
+    centers = distance * np.column_stack([np.cos(beta), np.sin(beta)])
+
+    r, theta = tooth_polar(pressure_angle, planet, 0.0, backlash, steps, root_steps)
+    bodies = replicate(r, theta, planet, scale, phase) + centers[:, None, :]
+
+    # the ring turns so that a space faces the outer tooth of the first planet
+    facing = (-phase[0] * planet / (2.0 * math.pi)) % 1.0
+    ring_phase = (math.pi - 2.0 * math.pi * facing) / ring
+    tip = ring_tip_radius(pressure_angle, ring, planet)
+    ri, rtheta = internal_tooth_polar(pressure_angle, ring, backlash, steps, tip)
+
+    return {
+        'sun': make_gear(diameter, pressure_angle, sun, pitch, 0.0, backlash, steps, root_steps),
+        'planets': bodies,
+        'centers': centers,
+        'ring': replicate(ri, rtheta, ring, scale, ring_phase),
+    }
@@ -0,0 +1,310 @@
+# Memory-mapped storage of long traces.
+#
+# Harmonograph and involute spiral drawings run to millions of points. A trace file
+# keeps them on disk, written as they are generated and read back through a memory
+# map, so neither generating nor exporting a trace needs it in memory as a whole:
+#
+#     with Trace('spiral.trace', 'w') as trace:
+#         for chunk in generator:
+#             trace.append(chunk)              # (n, 2) points
+#
+#     trace = Trace('spiral.trace')
+#     trace.points(1000000, 2000000)           # a view into the file, nothing is read
+#     export_svg(trace, 'spiral.svg', tolerance=0.01)
+#
+# Layout, little endian:
+#
+#   0    header: magic, dtype, columns, point count, chunk count, offset of the chunk
+#        index and bounding box of all points (HEADER)
+#   128  points, count rows of columns values of dtype
+#   ...  chunk index, one INDEX record per appended chunk: first point, point count,
+#        curve number and bounding box
+#
+# A trace holds one or more curves (polylines). Every append starts a new curve
+# unless it continues the last one, so a curve too long to generate at once is
+# appended in pieces. The chunk index and header are rewritten after the points by
+# flush() and close(); a file is consistent from then on.
+
+import collections
+import struct
+
+import numpy as np
+
+from .export import format_coordinates, svg_path
+
+
+MAGIC = b'GTRACE\x00\x01'
+HEADER = struct.Struct('<8s8sIQQQ4d')
+DATA_OFFSET = 128
+INDEX = np.dtype([('start', '<u8'), ('count', '<u8'), ('curve', '<u8'), ('bbox', '<f8', 4)])
+
+# points per window read by simplify and the exporters
+WINDOW = 1 << 14
+
+Chunk = collections.namedtuple('Chunk', 'start count curve bbox')
+
+
+def _bbox(points):
+    """(minx, miny, maxx, maxy) of (n, 2) points"""
+    return np.concatenate([points.min(axis=0), points.max(axis=0)])
+
+
+def _merge(a, b):
+    return np.concatenate([np.minimum(a[:2], b[:2]), np.maximum(a[2:], b[2:])])
+
+
+class Trace(object):
+    """
+    a trace file opened for reading ('r'), created ('w') or appended to ('a'). points
+    are rows of columns values of dtype; the first two are x and y.
+    """
+
+    def __init__(self, filename, mode='r', dtype='<f8', columns=2):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError("mode must be 'r', 'w' or 'a', got %r" % mode)
+        self.filename = filename
+        self.mode = mode
+        self._file = open(filename, {'r': 'rb', 'w': 'w+b', 'a': 'r+b'}[mode])
+        self._map = None
+        if mode == 'w':
+            self.dtype = np.dtype(dtype).newbyteorder('<')
+            self.columns = columns
+            self.count = 0
+            self.bbox = np.array([np.inf, np.inf, -np.inf, -np.inf])
+            self._index = np.zeros(0, INDEX)
+            self._dirty = True
+            self.flush()
+        else:
+            self._read_header()
+            self._dirty = False
+
+    def _read_header(self):
+        self._file.seek(0)
+        data = self._file.read(HEADER.size)
+        if len(data) < HEADER.size or data[:8] != MAGIC:
+            raise ValueError("%s is not a trace file" % self.filename)
+        magic, dtype, columns, count, chunks, index_offset, x0, y0, x1, y1 = HEADER.unpack(data)
+        self.dtype = np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+        self.columns = columns
+        self.count = count
+        self.bbox = np.array([x0, y0, x1, y1])
+        self._file.seek(index_offset)
+        self._index = np.frombuffer(self._file.read(chunks * INDEX.itemsize), INDEX).copy()
+        if len(self._index) != chunks:
+            raise ValueError("%s: chunk index cut short" % self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._map = None
+        self._file.close()
+
+    def _end(self):
+        return DATA_OFFSET + self.count * self.columns * self.dtype.itemsize
+
+    def flush(self):
+        """writes the chunk index after the points, then the header"""
+        if not self._dirty:
+            return
+        end = self._end()
+        self._file.seek(end)
+        self._file.write(self._index.tobytes())
+        self._file.truncate()
+        self._file.seek(0)
+        header = HEADER.pack(MAGIC, self.dtype.str.encode('ascii'), self.columns, self.count,
+                             len(self._index), end, *self.bbox)
+        self._file.write(header.ljust(DATA_OFFSET, b'\0'))
+        self._file.flush()
+        self._dirty = False
+
+    def append(self, points, continues=False):
+        """
+        writes (n, columns) points after the last ones as a new chunk. the chunk starts a
+        new curve, or with continues adds to the last one.
+        """
+        if self.mode == 'r':
+            raise ValueError("%s is open for reading" % self.filename)
+        points = np.ascontiguousarray(points, dtype=self.dtype)
+        if points.ndim != 2 or points.shape[1] != self.columns:
+            raise ValueError("expected (n, %d) points, got shape %s" % (self.columns, points.shape))
+        if not len(points):
+            return
+        curve = self.curves() - (1 if continues and len(self._index) else 0)
+        bbox = _bbox(points[:, :2].astype(float))
+        self._file.seek(self._end())
+        self._file.write(points.tobytes())
+        self._index = np.append(self._index, np.array([(self.count, len(points), curve, bbox)], INDEX))
+        self.count += len(points)
+        self.bbox = _merge(self.bbox, bbox)
+        self._map = None
+        self._dirty = True
+
+    def _points(self):
+        """memory map of all points, remade when points were appended"""
+        if self._map is None or len(self._map) != self.count:
+            if self.count == 0:
+                return np.zeros((0, self.columns), self.dtype)
+            self._file.flush()
+            self._map = np.memmap(self._file, self.dtype, 'r' if self.mode == 'r' else 'r+',
+                                  DATA_OFFSET, (self.count, self.columns))
+        return self._map
+
+    def points(self, start=0, stop=None):
+        """the points start to stop as a view into the file"""
+        return self._points()[start:stop]
+
+    def chunks(self):
+        return len(self._index)
+
+    def chunk(self, i):
+        start, count, curve, bbox = self._index[i]
+        return Chunk(int(start), int(count), int(curve), bbox)
+
+    def curves(self):
+        return int(self._index['curve'][-1]) + 1 if len(self._index) else 0
+
+    def curve_range(self, i):
+        """(start, stop) point numbers of curve i"""
+        chunks = np.flatnonzero(self._index['curve'] == i)
+        if not len(chunks):
+            raise IndexError("trace has %d curves" % self.curves())
+        first, last = self._index[chunks[0]], self._index[chunks[-1]]
+        return int(first['start']), int(last['start'] + last['count'])
+
+    def curve(self, i):
+        """the points of curve i as a view into the file"""
+        return self.points(*self.curve_range(i))
+
+    def curve_bbox(self, i):
+        boxes = self._index['bbox'][self._index['curve'] == i]
+        return np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)])
+
+    def windows(self, start=0, stop=None, size=WINDOW, overlap=1):
+        """
+        yields views of at most size points covering start to stop. with overlap each
+        window starts on the last point of the one before, so polylines drawn window
+        by window join up
+        """
+        stop = self.count if stop is None else min(stop, self.count)
+        step = max(1, size - overlap)
+        while start < stop:
+            yield self.points(start, min(start + size, stop))
+            if start + size >= stop:
+                break
+            start += step
+
+    def chunks_in(self, bbox):
+        """numbers of the chunks with points within (minx, miny, maxx, maxy)"""
+        boxes = self._index['bbox']
+        return np.flatnonzero((boxes[:, 0] <= bbox[2]) & (boxes[:, 2] >= bbox[0])
+                              & (boxes[:, 1] <= bbox[3]) & (boxes[:, 3] >= bbox[1]))
+
+
+def simplify(points, tolerance):
+    """
+    Douglas-Peucker: the indices of the points of a polyline to keep so that no point
+    left out is further than tolerance from the simplified line. ends are always kept.
+
+    the segments are split a level at a time, all of them at once, instead of one by
+    one: each round measures every undecided point against the chord of its segment
+    and keeps the furthest point of every segment that is out of tolerance
+    """
+    points = np.asarray(points, dtype=float)[:, :2]
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    keep = np.zeros(n, bool)
+    keep[[0, -1]] = True
+    undecided = ~keep
+    while True:
+        candidates = np.flatnonzero(undecided)
+        if not len(candidates):
+            return np.flatnonzero(keep)
+        kept = np.flatnonzero(keep)
+        right = np.searchsorted(kept, candidates)
+        a, b = points[kept[right - 1]], points[kept[right]]
+        d = b - a
+        r = points[candidates] - a
+        length = np.hypot(d[:, 0], d[:, 1])
+        distance = np.where(length > 0,
+                            np.abs(r[:, 0] * d[:, 1] - r[:, 1] * d[:, 0]) / np.where(length > 0, length, 1.0),
+                            np.hypot(r[:, 0], r[:, 1]))
+
+        first = np.flatnonzero(np.r_[True, right[1:] != right[:-1]])
+        segment = np.cumsum(np.r_[True, right[1:] != right[:-1]]) - 1
+        furthest = np.maximum.reduceat(distance, first)[segment]
+        split = np.flatnonzero((distance == furthest) & (furthest > tolerance))
+        split = split[np.r_[True, segment[split][1:] != segment[split][:-1]]] if len(split) else split
+        keep[candidates[split]] = True
+        undecided[candidates[split]] = False
+        undecided[candidates[furthest <= tolerance]] = False
+
+
+def curve_pieces(trace, i, tolerance=None, size=WINDOW):
+    """
+    yields curve i of a trace as (n, 2) float arrays of at most size points, window by
+    window, each simplified to tolerance if one is given. every piece starts with the
+    last point of the one before
+    """
+    start, stop = trace.curve_range(i)
+    for window in trace.windows(start, stop, size):
+        window = window[:, :2]
+        if tolerance is not None:
+            window = window[simplify(window, tolerance)]
+        yield np.asarray(window, dtype=float)
+
+
+def export_svg(trace, filename, scale=1.0, precision=3, tolerance=None, size=WINDOW):
+    """
+    writes every curve of a trace as an svg path, placed as export.export_svg places an
+    outline, reading size points at a time
+    """
+    minx, miny, maxx, maxy = trace.bbox
+    cenx, ceny = (minx + maxx) / 2.0, (miny + maxy) / 2.0
+    sx, sy = (maxx - cenx) * 1.1, (maxy - ceny) * 1.1
+    with open(filename, 'w') as out:
+        out.write('<?xml version="1.0" standalone="no" ?>\n')
+        out.write('<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN" "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
+        out.write('<svg xmlns="http://www.w3.org/2000/svg" version="1.1" x="%fpx" y="%fpx" width="%fpx" height="%fpx">\n'
+                  % (scale * (cenx - sx), scale * (ceny - sy), scale * 2 * sx, scale * 2 * sy))
+        for i in range(trace.curves()):
+            out.write('<path style="fill:none;stroke:black;stroke-width:1" d="')
+            for piece in curve_pieces(trace, i, tolerance, size):
+                out.write(svg_path(piece[:, 0].tolist(), piece[:, 1].tolist(), scale, sx, sy, precision))
+            out.write('" />\n')
+        out.write('</svg>\n')
+
+
+def export_gcode(trace, filename, scale=1.0, feed=100.0, tolerance=None, size=WINDOW):
+    """
+    writes every curve of a trace as gcode for a pen plotter or cutter: a rapid move
+    to its start, tool on (M3), feed moves, tool off (M5). reads size points at a time
+    """
+    with open(filename, 'w') as out:
+        out.write('(%s by gears.py)\nG90\n' % filename)
+        for i in range(trace.curves()):
+            first = True
+            for piece in curve_pieces(trace, i, tolerance, size):
+                xs = format_coordinates(piece[:, 0].tolist(), scale)
+                ys = format_coordinates(piece[:, 1].tolist(), scale)
+                if first:
+                    out.write('G0 X%s Y%s\nM3\n' % (xs[0], ys[0]))
+                    if len(xs) > 1:
+                        out.write('G1 X%s Y%s F%g\n' % (xs[1], ys[1], feed))
+                    xs, ys = xs[2:], ys[2:]
+                    first = False
+                else:
+                    xs, ys = xs[1:], ys[1:]
+                out.write(''.join('G1 X%s Y%s\n' % point for point in zip(xs, ys)))
+            out.write('M5\n')
+        out.write('M2\n')
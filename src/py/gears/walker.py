@@ -0,0 +1,240 @@
+# Strandbeest walkers: Jansen legs on one crankshaft.
+#
+# A Jansen leg is a one degree of freedom linkage driven by a crank. With the crank
+# axle O at the origin and the fixed pivot B below and behind it, every other joint
+# is where two links of known length meet, the intersection of two circles:
+#
+#     C  crank tip          m from O, at the crank angle
+#     D  upper joint        j from C, b from B
+#     F  lower joint        k from C, c from B
+#     E  back joint         e from D, d from B     (BDE is one rigid triangle)
+#     G  knee               f from E, g from F
+#     H  foot               h from G, i from F     (FGH is one rigid triangle)
+#
+# A walker has several legs on the same crankshaft at different crank phases, some
+# of them mirrored to face the other way. simulate() solves every leg of a whole
+# batch of layouts over a crank turn at once; gait() works out which feet carry the
+# body at every moment from the lowest feet, the ripple of the body height over a
+# turn and the stride of every leg.
+#
+#     feet = simulate(np.radians([[0, 120, 240], [0, 90, 180]]), steps=360)
+#     result = gait(feet)
+#     result['ripple'], result['min_contacts']
+#
+# Lengths default to Jansen's "holy numbers".
+#
+# https://www.strandbeest.com/explains
+
+import collections
+import math
+import os
+
+import numpy as np
+
+from .export import export_dxf_outlines, export_svg_outlines
+
+
+JANSEN = {
+    'a': 38.0, 'b': 41.5, 'c': 39.3, 'd': 40.1, 'e': 55.8, 'f': 39.4, 'g': 36.7,
+    'h': 65.7, 'i': 49.0, 'j': 50.0, 'k': 61.9, 'l': 7.8, 'm': 15.0,
+}
+
+# the links of a leg as the joints they join and the lengths between them: a bar's
+# two joints, or a plate's three with the lengths first-second, first-third and
+# second-third
+LINKS = collections.OrderedDict([
+    ('crank', ('OC', 'm')),
+    ('upper', ('CD', 'j')),
+    ('lower', ('CF', 'k')),
+    ('hip', ('BF', 'c')),
+    ('thigh', ('EG', 'f')),
+    ('back', ('BDE', 'bde')),
+    ('foot', ('FGH', 'gih')),
+])
+
+
+def _intersect(p0, r0, p1, r1, side):
+    """
+    the point r0 from p0 and r1 from p1 on the left (side 1) or right (side -1) of the
+    line from p0 to p1; (..., 2) arrays, NaN where the circles do not meet
+    """
+    d = p1 - p0
+    dist2 = np.sum(d * d, axis=-1)
+    along = (r0 * r0 - r1 * r1 + dist2) / (2.0 * dist2)
+    across = side * np.sqrt(r0 * r0 / dist2 - along * along)
+    return np.stack([p0[..., 0] + along * d[..., 0] - across * d[..., 1],
+                     p0[..., 1] + along * d[..., 1] + across * d[..., 0]], axis=-1)
+
+
+def leg_joints(angles, linkage=JANSEN):
+    """
+    the joints of a leg at crank angles (any array shape) as a dict of (..., 2)
+    arrays. positions the linkage cannot reach are NaN
+    """
+    L = linkage
+    angles = np.asarray(angles, dtype=float)
+    O = np.zeros(angles.shape + (2,))
+    B = np.broadcast_to(np.array([-L['a'], -L['l']]), O.shape)
+    C = L['m'] * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    D = _intersect(C, L['j'], B, L['b'], -1)
+    F = _intersect(C, L['k'], B, L['c'], 1)
+    E = _intersect(D, L['e'], B, L['d'], -1)
+    G = _intersect(E, L['f'], F, L['g'], -1)
+    H = _intersect(G, L['h'], F, L['i'], -1)
+    return {'O': O, 'B': B, 'C': C, 'D': D, 'E': E, 'F': F, 'G': G, 'H': H}
+
+
+def foot_path(angles, linkage=JANSEN, mirrored=False):
+    """
+    the foot of a leg at crank angles as (..., 2). a mirrored leg on the same crank is
+    the mirror image of the leg at the mirrored crank angle, pi - angle; its foot
+    pushes the same way
+    """
+    angles = np.asarray(angles, dtype=float)
+    mirrored = np.asarray(mirrored, dtype=bool)
+    feet = leg_joints(np.where(mirrored, math.pi - angles, angles), linkage)['H']
+    feet[..., 0] = np.where(mirrored, -feet[..., 0], feet[..., 0])
+    return feet
+
+
+def simulate(phases, mirrored=False, steps=360, linkage=JANSEN):
+    """
+    the feet of walkers over one crank turn. phases (..., legs) are the crank angles of
+    the legs, NaN for a leg that is not there, so that layouts with different numbers
+    of legs fit in one batch; mirrored broadcasts against them. returns
+    (..., legs, steps, 2).
+
+    legs that share a phase and a side move alike, so the linkage is only solved once
+    for every distinct (phase, mirrored) pair in the batch
+    """
+    phases = np.asarray(phases, dtype=float)
+    mirrored = np.broadcast_to(np.asarray(mirrored, dtype=bool), phases.shape)
+    crank = 2.0 * math.pi * np.arange(steps) / steps
+
+    phase = np.mod(phases, 2.0 * math.pi).ravel()
+    keys = np.where(np.isnan(phase), -1.0, phase) + 10.0 * mirrored.ravel()
+    unique, inverse = np.unique(keys, return_inverse=True)
+    first = np.zeros(len(unique), int)
+    first[inverse[::-1]] = np.arange(len(keys))[::-1]
+    paths = foot_path(phase[first][:, None] + crank, linkage, mirrored.ravel()[first][:, None])
+    return paths[inverse.ravel()].reshape(phases.shape + (steps, 2))
+
+
+def gait(feet, tolerance=0.5):
+    """
+    ground contact of walkers from their feet, (..., legs, steps, 2) as simulate
+    returns them, on flat ground. the lowest foot carries the body, and every foot
+    within tolerance of it is taken to be on the ground too. returns a dict:
+
+        ground        (..., steps) height of the lowest foot below the crank axle
+        contact       (..., legs, steps) feet on the ground
+        contacts      (..., steps) number of feet on the ground
+        min_contacts  (...) fewest feet on the ground during a turn
+        body_height   (..., steps) height of the crank axle above the ground
+        ripple        (...) rise and fall of the body over a turn
+        duty          (..., legs) share of the turn each foot is on the ground
+        stride        (..., legs) distance each foot moves along the ground while
+                      carrying, the distance the walker covers per turn
+    """
+    x, y = feet[..., 0], feet[..., 1]
+    low = np.where(np.isnan(y), np.inf, y)
+    ground = low.min(axis=-2)
+    contact = low <= ground[..., None, :] + tolerance
+    body_height = -ground
+
+    with np.errstate(invalid='ignore'):
+        stride = np.where(contact.any(axis=-1),
+                          np.where(contact, x, -np.inf).max(axis=-1)
+                          - np.where(contact, x, np.inf).min(axis=-1), 0.0)
+    contacts = contact.sum(axis=-2)
+    return {
+        'ground': ground,
+        'contact': contact,
+        'contacts': contacts,
+        'min_contacts': contacts.min(axis=-1),
+        'body_height': body_height,
+        'ripple': body_height.max(axis=-1) - body_height.min(axis=-1),
+        'duty': contact.mean(axis=-1),
+        'stride': stride,
+    }
+
+
+def evaluate_layouts(phases, mirrored=False, steps=360, linkage=JANSEN, tolerance=0.5):
+    """simulate() followed by gait()"""
+    return gait(simulate(phases, mirrored, steps, linkage), tolerance)
+
+
+def even_phases(legs, pairs=False):
+    """
+    crank phases spreading legs evenly over a turn; with pairs every phase carries a
+    leg and its mirror image. returns (phases, mirrored)
+    """
+    phases = 2.0 * math.pi * np.arange(legs) / legs
+    if not pairs:
+        return phases, np.zeros(legs, bool)
+    return np.repeat(phases, 2), np.tile([False, True], legs)
+
+
+def link_shapes(linkage=JANSEN):
+    """
+    the joint positions of every link in its own frame, first joint on the origin and
+    second on +x, as {name: (n, 2)} for the links of LINKS
+    """
+    shapes = collections.OrderedDict()
+    for name, (joints, lengths) in LINKS.items():
+        if len(joints) == 2:
+            shapes[name] = np.array([[0.0, 0.0], [linkage[lengths], 0.0]])
+        else:
+            # sides from the first joint to the second and third, and between those
+            a, b, c = (linkage[length] for length in lengths)
+            x = (a * a + b * b - c * c) / (2.0 * a)
+            shapes[name] = np.array([[0.0, 0.0], [a, 0.0], [x, math.sqrt(b * b - x * x)]])
+    return shapes
+
+
+def rounded_outline(joints, radius, steps=16):
+    """
+    the closed outline of a link: the joints (a bar's two, a plate's three, counter-
+    clockwise) surrounded by radius, i.e. straight sides joined by arcs
+    """
+    joints = np.asarray(joints, dtype=float)
+    edge = np.roll(joints, -1, axis=0) - joints
+    out = np.arctan2(-edge[:, 0], edge[:, 1])
+    start = np.roll(out, 1)
+    sweep = np.mod(out - start, 2.0 * math.pi)
+    t = np.linspace(0.0, 1.0, steps + 1)
+    angles = start[:, None] + sweep[:, None] * t
+    points = joints[:, None, :] + radius * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    points = points.reshape(-1, 2)
+    return np.vstack([points, points[:1]])
+
+
+def _circle(center, radius, steps):
+    angles = 2.0 * math.pi * np.arange(steps + 1) / steps
+    return np.column_stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)])
+
+
+def leg_links(linkage=JANSEN, width=8.0, hole=1.5, gap=4.0, steps=16):
+    """
+    the cut outlines of one leg: every link of LINKS as a rounded bar or plate of
+    width with a hole of radius hole at every joint, laid out in a column gap apart.
+    returns a list of (px, py) outlines
+    """
+    outlines = []
+    y = 0.0
+    for name, joints in link_shapes(linkage).items():
+        outline = rounded_outline(joints, width / 2.0, steps)
+        shift = np.array([0.0, y - outline[:, 1].min()])
+        outlines.append(outline + shift)
+        outlines.extend(_circle(joint + shift, hole, 4 * steps) for joint in joints)
+        y = outline[:, 1].max() + shift[1] + gap
+    return [(o[:, 0].tolist(), o[:, 1].tolist()) for o in outlines]
+
+
+def export_leg_links(filename, linkage=JANSEN, width=8.0, hole=1.5, gap=4.0, scale=1.0):
+    """writes the links of one leg (leg_links) as an .svg or .dxf cut sheet"""
+    outlines = leg_links(linkage, width, hole, gap)
+    if os.path.splitext(filename)[1].lower() == '.dxf':
+        export_dxf_outlines(outlines, filename, scale)
+    else:
+        export_svg_outlines(outlines, filename, scale)